@@ -3,13 +3,19 @@
 # plots are saved to the results folder
 
 from pathlib import Path
+import argparse
 import collections
+import hashlib
+import json
 import calendar
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from src.config import (data_folder,results_folder,spotify_kworb_kaggle1_filename,spotify_green,text_color,bg_color,audio_feature_columns)
+from src.config import (data_folder,results_folder,spotify_kworb_kaggle1_filename,spotify_green,text_color,bg_color,audio_feature_columns,bootstrap_resamples,resample_block_size,confidence_level,stats_seed,stats_workers)
+from src.feature_matrix import matrix_to_frame
+from src.plot_render import render_bar
+from src.resampling_stats import group_mean_statistics, correlation_statistics, error_bar_sizes
 
 def apply_spotify_style(ax):
     fig = ax.get_figure()
@@ -26,6 +32,55 @@ def pick_column(data, possible_names):
             return name
     return None
 
+def as_frame(data):
+    # the analyses also accept the float32 matrix written by the merge step
+    if isinstance(data, np.ndarray):
+        return matrix_to_frame(data)
+    return data
+
+# plot cache: results/plot_cache.json maps each png to a fingerprint of the data it was drawn from
+plot_cache = {"force": False, "hits": 0, "misses": 0, "manifests": {}}
+plot_manifest_filename = "plot_cache.json"
+
+def plot_fingerprint(data, *params):
+    hashed = pd.util.hash_pandas_object(data, index=True).to_numpy()
+    columns = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+    extra = repr((columns, params, spotify_green, text_color, bg_color))
+    return hashlib.sha256(hashed.tobytes() + extra.encode("utf-8")).hexdigest()
+
+# every setting that changes the stats_*.csv tables and error bars
+stats_settings = (bootstrap_resamples, resample_block_size, confidence_level, stats_seed)
+
+def stats_plot_is_cached(output_path, fingerprint, stats_path):
+    # a deleted stats table is redrawn together with its plot
+    if not stats_path.exists():
+        plot_cache["misses"] += 1
+        return False
+    return plot_is_cached(output_path, fingerprint)
+
+def load_plot_manifest(results_dir):
+    if results_dir not in plot_cache["manifests"]:
+        manifest_path = results_dir / plot_manifest_filename
+        manifest = {}
+        if manifest_path.exists():
+            manifest = json.loads(manifest_path.read_text())
+        plot_cache["manifests"][results_dir] = manifest
+    return plot_cache["manifests"][results_dir]
+
+def plot_is_cached(output_path, fingerprint):
+    manifest = load_plot_manifest(output_path.parent)
+    if not plot_cache["force"] and output_path.exists() and manifest.get(output_path.name) == fingerprint:
+        plot_cache["hits"] += 1
+        print("Unchanged, skipped →", output_path)
+        return True
+    plot_cache["misses"] += 1
+    return False
+
+def remember_plot(output_path, fingerprint):
+    manifest = load_plot_manifest(output_path.parent)
+    manifest[output_path.name] = fingerprint
+    (output_path.parent / plot_manifest_filename).write_text(json.dumps(manifest, indent=1, sort_keys=True))
+
 def make_folder(folder_path):
     folder_path.mkdir(parents=True, exist_ok=True)
 
@@ -66,6 +121,7 @@ def load_data():
     return data, data_dir, results_dir
 
 def audio_features_vs_streams(data, results_dir):
+    data = as_frame(data)
     streams_column = pick_column(data, ["kworb_streams", "Streams"])
     if streams_column is None:
         streams_column = pick_streams_column(data)
@@ -81,27 +137,42 @@ def audio_features_vs_streams(data, results_dir):
         print("no rows with both audio features and streams")
         return
 
-    correlation_series = small_data.corr(numeric_only=True)[streams_column].sort_values(ascending=False)
+    output_bar = results_dir / "audio_features_vs_total_streams_bar.png"
+    output_pair = results_dir / "audio_features_pairplot_streams.png"
+    bar_fingerprint = plot_fingerprint(small_data, "bar", stats_settings)
+    pair_fingerprint = plot_fingerprint(small_data, "pairplot")
+    bar_cached = stats_plot_is_cached(output_bar, bar_fingerprint, results_dir / "stats_audio_feature_correlations.csv")
+    pair_cached = plot_is_cached(output_pair, pair_fingerprint)
 
 # bar chart
-    fig, ax = plt.subplots(figsize=(8, 5))
-    correlation_series.drop(streams_column, errors="ignore").plot(
-        kind="bar",
-        color=spotify_green,
-        ax=ax,)
-    ax.set_title("Correlation of Audio Features with Total Streams")
-    ax.set_xlabel("Feature")
-    ax.set_ylabel("Correlation with Total Streams")
-    apply_spotify_style(ax)
-    plt.tight_layout()
-    output_bar = results_dir / "audio_features_vs_total_streams_bar.png"
-    plt.savefig(output_bar)
-    plt.close(fig)
-    print("Saved plot →", output_bar)
+    if not bar_cached:
+        save_correlation_bar(small_data, streams_column, output_bar, results_dir)
+        remember_plot(output_bar, bar_fingerprint)
 
 # pairplot
+    if not pair_cached:
+        save_pairplot(small_data, audio_columns + [streams_column], output_pair)
+        remember_plot(output_pair, pair_fingerprint)
+
+def save_correlation_bar(small_data, streams_column, output_bar, results_dir):
+    feature_columns = [c for c in small_data.columns if c != streams_column]
+    statistics = correlation_statistics(small_data, feature_columns, streams_column, workers=stats_workers)
+    statistics = statistics.dropna(subset=["correlation"]).sort_values("correlation", ascending=False)
+    statistics.to_csv(results_dir / "stats_audio_feature_correlations.csv", index=False)
+    render_bar(
+        output_bar,
+        statistics["feature"],
+        statistics["correlation"].values,
+        "Correlation of Audio Features with Total Streams",
+        xlabel="Feature",
+        ylabel="Correlation with Total Streams",
+        figsize=(8, 5),
+        tick_rotation=90,
+        template_key="feature_correlation",
+        errors=error_bar_sizes(statistics, "correlation"))
+    print("Saved plot →", output_bar)
 
-    pairplot_columns = audio_columns + [streams_column]
+def save_pairplot(small_data, pairplot_columns, output_pair):
     graph = sns.pairplot(
         small_data,
         vars=pairplot_columns,
@@ -112,7 +183,6 @@ def audio_features_vs_streams(data, results_dir):
             if ax is not None:
                 apply_spotify_style(ax)
     plt.tight_layout()
-    output_pair = results_dir / "audio_features_pairplot_streams.png"
     plt.savefig(output_pair)
     plt.close()
     print("Saved pairplot →", output_pair)
@@ -134,40 +204,52 @@ def release_month_vs_streams(data, results_dir):
         print("No valid release_month/streams data")
         return
 
-    month_average = month_and_streams.groupby("release_month")[streams_column].mean()
+    output_bar = results_dir / "release_month_vs_streams_bar.png"
+    fingerprint = plot_fingerprint(month_and_streams, stats_settings)
+    if stats_plot_is_cached(output_bar, fingerprint, results_dir / "stats_release_month_streams.csv"):
+        return
+
+    # bootstrap CI + permutation p-value per month, months without songs stay empty
+    statistics = group_mean_statistics(month_and_streams[streams_column], month_and_streams["release_month"].astype(int), workers=stats_workers)
+    statistics = statistics.rename(columns={"group": "release_month"}).set_index("release_month")
     month_indexes = list(range(1, 13))
-    month_average = month_average.reindex(month_indexes)
+    statistics = statistics.reindex(month_indexes)
+    statistics.to_csv(results_dir / "stats_release_month_streams.csv")
     month_names = [calendar.month_abbr[m] for m in month_indexes]
 
-    fig, ax = plt.subplots(figsize=(7, 5))
-    ax.bar(month_names, month_average.values, color=spotify_green)
-    ax.set_xlabel("Month")
-    ax.set_ylabel("Average Streams")
-    ax.set_title("Average Streams by Release Month")
-    ax.set_ylim(bottom=6e5)
-    apply_spotify_style(ax)
-    plt.tight_layout()
-    output_bar = results_dir / "release_month_vs_streams_bar.png"
-    plt.savefig(output_bar)
-    plt.close(fig)
+    render_bar(
+        output_bar,
+        month_names,
+        statistics["mean"].values,
+        "Average Streams by Release Month",
+        xlabel="Month",
+        ylabel="Average Streams",
+        figsize=(7, 5),
+        ylim_bottom=6e5,
+        template_key="release_month",
+        errors=error_bar_sizes(statistics, "mean"))
+    remember_plot(output_bar, fingerprint)
     print("Saved plot →", output_bar)
 
 # total words vs streams
 
+def lyric_words(text):
+    text = str(text)
+    text = text.replace("’", "'")
+    pieces = text.lower().split()
+    cleaned_words = [w.strip(".,!?\"'()[]{}:;") for w in pieces]
+    return [w for w in cleaned_words if w]
+
+def total_word_count(text):
+    if pd.isna(text):
+        return np.nan
+    return len(lyric_words(text))
+
 def total_words_vs_streams(data, results_dir):
     streams_column = pick_streams_column(data)
     if "lyrics" not in data.columns or streams_column is None:
         print("columns missing.")
         return
-    def total_word_count(text):
-        if pd.isna(text):
-            return np.nan
-        text = str(text)
-        text = text.replace("’", "'")
-        pieces = text.lower().split()
-        cleaned_words = [w.strip(".,!?\"'()[]{}:;") for w in pieces]
-        cleaned_words = [w for w in cleaned_words if w]
-        return len(cleaned_words)
     data_copy = data.copy()
     data_copy["total_words"] = data_copy["lyrics"].apply(total_word_count)
     words_and_streams = data_copy[["total_words", streams_column]].dropna()
@@ -175,6 +257,11 @@ def total_words_vs_streams(data, results_dir):
         print("No data for total words vs streams")
         return
 
+    output_path = results_dir / "total_words_vs_streams.png"
+    fingerprint = plot_fingerprint(words_and_streams)
+    if plot_is_cached(output_path, fingerprint):
+        return
+
     fig, ax = plt.subplots(figsize=(7, 5))
     sns.regplot(
         data=words_and_streams,
@@ -188,13 +275,37 @@ def total_words_vs_streams(data, results_dir):
     ax.set_title("Total Lyrics Word Count vs Streams")
     apply_spotify_style(ax)
     plt.tight_layout()
-    output_path = results_dir / "total_words_vs_streams.png"
     plt.savefig(output_path)
     plt.close(fig)
+    remember_plot(output_path, fingerprint)
     print("Saved plot →", output_path)
 
 # most common words in top songs
 
+# words to ginore
+lyric_stopwords = {
+    "the", "and", "a", "to", "of", "in", "it", "is", "i", "you","on", "for", "that", "me", "my", "your", "with", "this", "be",
+    "at", "we", "so", "but", "not", "no", "do", "are", "all","la", "oh", "yeah", "ya", "na", "ooh", "ah", "uh",
+    "when", "just", "know", "what", "now", "youre", "yours","dont", "let", "its", "never", "cause", "because", "was",
+    "can", "cant", "nah", "like", "out", "come", "been", "get","too", "used", "im", "i'm", "i’m", "ive", "i've", "want", "wanna",
+    "you're", "youre", "it's", "its", "feel", "say", "one", "down","got", "back", "thats", "that's", "hey", "take", "see", "doin",
+    "baby", "girl", "boy", "woah", "whoa", "mmm", "i'll", "I'll",
+    "way", "give", "have", "here", "every", "her", "need", "how","make", "they", "only", "where", "we're", "from", "could",
+    "away", "said", "gonna", "won't", "will", "why", "more", "bad","tell", "our", "keep", "then", "still", "think", "into", "good",
+    "day", "would", "were", "side", "some", "right", "something",
+    "look", "ever", "ain't", "knew", "maybe", "even", "stop","there", "gotta", "nothing", "turn", "had", "through", "over",
+    "around", "hard", "play", "much","don't","can't","let's","things"}
+
+def top_words(data, streams_column, top_n=20):
+    top_streams_cutoff = data[streams_column].quantile(0.75)
+    top_songs_data = data[data[streams_column] >= top_streams_cutoff]
+    all_words = []
+    for lyrics_text in top_songs_data["lyrics"].dropna():
+        all_words.extend(lyric_words(lyrics_text))
+    filtered_words = [w for w in all_words if w not in lyric_stopwords and len(w) > 2]
+    word_counter = collections.Counter(filtered_words)
+    return word_counter.most_common(top_n)
+
 def most_common_high_stream_words(data, results_dir, top_n=20):
     streams_column = pick_streams_column(data)
     if "lyrics" not in data.columns or streams_column is None:
@@ -204,51 +315,31 @@ def most_common_high_stream_words(data, results_dir, top_n=20):
     if data_copy[streams_column].isna().all():
         print("No streams values for lyrics word analysis")
         return
-    top_streams_cutoff = data_copy[streams_column].quantile(0.75)
-    top_songs_data = data_copy[data_copy[streams_column] >= top_streams_cutoff]
-    all_words = []
-    for lyrics_text in top_songs_data["lyrics"].dropna():
-        lyrics_text = str(lyrics_text)
-        lyrics_text = lyrics_text.replace("’", "'")
-        pieces = lyrics_text.lower().split()
-        cleaned_tokens = [w.strip(".,!?\"'()[]{}:;") for w in pieces]
-        cleaned_tokens = [w for w in cleaned_tokens if w]
-        all_words.extend(cleaned_tokens)
-
-# words to ginore
-    stopwords = {
-        "the", "and", "a", "to", "of", "in", "it", "is", "i", "you","on", "for", "that", "me", "my", "your", "with", "this", "be",
-        "at", "we", "so", "but", "not", "no", "do", "are", "all","la", "oh", "yeah", "ya", "na", "ooh", "ah", "uh",
-        "when", "just", "know", "what", "now", "youre", "yours","dont", "let", "its", "never", "cause", "because", "was",
-        "can", "cant", "nah", "like", "out", "come", "been", "get","too", "used", "im", "i'm", "i’m", "ive", "i've", "want", "wanna",
-        "you're", "youre", "it's", "its", "feel", "say", "one", "down","got", "back", "thats", "that's", "hey", "take", "see", "doin",
-        "baby", "girl", "boy", "woah", "whoa", "mmm", "i'll", "I'll",
-        "way", "give", "have", "here", "every", "her", "need", "how","make", "they", "only", "where", "we're", "from", "could",
-        "away", "said", "gonna", "won't", "will", "why", "more", "bad","tell", "our", "keep", "then", "still", "think", "into", "good",
-        "day", "would", "were", "side", "some", "right", "something",
-        "look", "ever", "ain't", "knew", "maybe", "even", "stop","there", "gotta", "nothing", "turn", "had", "through", "over",
-        "around", "hard", "play", "much","don't","can't","let's","things"}
-    filtered_words = [w for w in all_words if w not in stopwords and len(w) > 2]
-    word_counter = collections.Counter(filtered_words)
-    most_common_list = word_counter.most_common(top_n)
+    output_path = results_dir / "top_words_in_high_stream_songs.png"
+    fingerprint = plot_fingerprint(data_copy[[streams_column, "lyrics"]], top_n)
+    if plot_is_cached(output_path, fingerprint):
+        return
+    most_common_list = top_words(data_copy, streams_column, top_n)
     if not most_common_list:
         print("No words found after filtering")
         return
     words, counts = zip(*most_common_list)
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.bar(words, counts, color=spotify_green)
-    ax.set_xticklabels(words, rotation=45, ha="right")
-    ax.set_ylabel("Count")
-    ax.set_title("Most Common Words in High-Stream Songs")
-    apply_spotify_style(ax)
-    plt.tight_layout()
-    output_path = results_dir / "top_words_in_high_stream_songs.png"
-    plt.savefig(output_path)
-    plt.close(fig)
+    render_bar(
+        output_path,
+        words,
+        counts,
+        "Most Common Words in High-Stream Songs",
+        ylabel="Count",
+        figsize=(8, 5),
+        tick_rotation=45,
+        tick_ha="right",
+        template_key="top_words")
+    remember_plot(output_path, fingerprint)
     print("Saved plot →", output_path)
 
 # audio profiles- top & bottom 10%
 def audio_profiles_top_vs_bottom(data, results_dir):
+    data = as_frame(data)
     streams_column = pick_streams_column(data)
     if streams_column is None:
         print("streams column missing")
@@ -268,21 +359,27 @@ def audio_profiles_top_vs_bottom(data, results_dir):
     top_means = top_songs[audio_columns].mean()
     bottom_means = bottom_songs[audio_columns].mean()
     for feature_name in audio_columns:
-        fig, ax = plt.subplots(figsize=(5, 4))
+        output_feature_plot = results_dir / f"top_vs_bottom_{feature_name}_streams.png"
+        fingerprint = plot_fingerprint(cleaned_data[[feature_name, streams_column]])
+        if plot_is_cached(output_feature_plot, fingerprint):
+            continue
         values = [top_means[feature_name], bottom_means[feature_name]]
         labels = ["Top 10%", "Bottom 10%"]
-        ax.bar(labels, values, color=spotify_green)
-        ax.set_ylabel("Average " + feature_name)
-        ax.set_title(f"{feature_name.capitalize()}: Top vs Bottom (by Streams)")
-        apply_spotify_style(ax)
-        plt.tight_layout()
-        output_feature_plot = results_dir / f"top_vs_bottom_{feature_name}_streams.png"
-        plt.savefig(output_feature_plot)
-        plt.close(fig)
+        # all ten charts share one figure, only the bar heights and text change
+        render_bar(
+            output_feature_plot,
+            labels,
+            values,
+            f"{feature_name.capitalize()}: Top vs Bottom (by Streams)",
+            ylabel="Average " + feature_name,
+            figsize=(5, 4),
+            template_key="top_vs_bottom")
+        remember_plot(output_feature_plot, fingerprint)
         print("Saved feature comparison plot →", output_feature_plot)
 
 # tempo distribution
 def tempo_distribution(data, results_dir):
+    data = as_frame(data)
     if "tempo" not in data.columns:
         print("tempo column missing")
         return
@@ -290,6 +387,10 @@ def tempo_distribution(data, results_dir):
     if tempo_values.empty:
         print("No tempo data available")
         return
+    output_path = results_dir / "tempo_distribution.png"
+    fingerprint = plot_fingerprint(tempo_values)
+    if plot_is_cached(output_path, fingerprint):
+        return
     min_tempo = tempo_values.min()
     max_tempo = tempo_values.max()
     start_value = 5 * np.floor(min_tempo / 5.0)
@@ -298,19 +399,40 @@ def tempo_distribution(data, results_dir):
     tempo_buckets = pd.cut(tempo_values, bins=tempo_bins, include_lowest=True)
     bucket_counts = tempo_buckets.value_counts().sort_index()
     x_labels = [f"{int(interval.left)}-{int(interval.right)}" for interval in bucket_counts.index]
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.bar(x_labels, bucket_counts.values, color=spotify_green)
-    ax.set_xlabel("Tempo (BPM, 5-BPM ranges)")
-    ax.set_ylabel("Number of Songs")
-    ax.set_title("Distribution of Song Tempos")
-    ax.tick_params(axis="x", rotation=90)
-    apply_spotify_style(ax)
-    plt.tight_layout()
-    output_path = results_dir / "tempo_distribution.png"
-    plt.savefig(output_path)
-    plt.close(fig)
+    render_bar(
+        output_path,
+        x_labels,
+        bucket_counts.values,
+        "Distribution of Song Tempos",
+        xlabel="Tempo (BPM, 5-BPM ranges)",
+        ylabel="Number of Songs",
+        figsize=(10, 5),
+        tick_rotation=90,
+        template_key="tempo_distribution")
+    remember_plot(output_path, fingerprint)
     print("Saved plot →", output_path)
 
+# streams by tempo band (table only, backs the 120-125 bpm finding)
+def tempo_band_streams(data, results_dir):
+    data = as_frame(data)
+    streams_column = pick_streams_column(data)
+    if "tempo" not in data.columns or streams_column is None:
+        print("tempo or streams missing")
+        return
+    tempo_and_streams = data[["tempo", streams_column]].dropna()
+    if tempo_and_streams.empty:
+        print("No data for tempo vs streams")
+        return
+    tempo_band_start = (5 * np.floor(tempo_and_streams["tempo"] / 5.0)).astype(int)
+    tempo_bands = tempo_band_start.astype(str) + "-" + (tempo_band_start + 5).astype(str)
+    statistics = group_mean_statistics(tempo_and_streams[streams_column], tempo_bands, workers=stats_workers)
+    statistics = statistics.rename(columns={"group": "tempo_band"})
+    statistics["band_start"] = statistics["tempo_band"].str.split("-").str[0].astype(int)
+    statistics = statistics.sort_values("band_start").drop(columns="band_start")
+    output_path = results_dir / "stats_tempo_band_streams.csv"
+    statistics.to_csv(output_path, index=False)
+    print("Saved table →", output_path)
+
 # song duration vs streams
 def duration_vs_streams(data, results_dir):
     streams_column = pick_streams_column(data)
@@ -322,6 +444,10 @@ def duration_vs_streams(data, results_dir):
     if duration_and_streams.empty:
         print("No data for duration vs streams")
         return
+    output_path = results_dir / "duration_vs_streams_one_minute_bars.png"
+    fingerprint = plot_fingerprint(duration_and_streams, stats_settings)
+    if stats_plot_is_cached(output_path, fingerprint, results_dir / "stats_duration_streams.csv"):
+        return
     duration_and_streams = duration_and_streams.copy()
     duration_and_streams["duration_minutes"] = duration_and_streams[duration_column] / 60000.0
     max_minutes = duration_and_streams["duration_minutes"].max()
@@ -333,23 +459,27 @@ def duration_vs_streams(data, results_dir):
         bins=minute_bins,
         labels=minute_labels,
         include_lowest=True)
-    avg_streams_by_bin = duration_and_streams.groupby("duration_bin")[streams_column].mean().dropna()
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.bar(avg_streams_by_bin.index.astype(str), avg_streams_by_bin.values, color=spotify_green)
-    ax.set_xlabel("Song Duration (minutes)")
-    ax.set_ylabel("Average Streams")
-    ax.set_title("Average Streams by Song Duration Range")
-    ax.tick_params(axis="x", rotation=90)
-    apply_spotify_style(ax)
-    plt.tight_layout()
-    output_path = results_dir / "duration_vs_streams_one_minute_bars.png"
-    plt.savefig(output_path)
-    plt.close(fig)
+    statistics = group_mean_statistics(duration_and_streams[streams_column], duration_and_streams["duration_bin"], workers=stats_workers)
+    statistics = statistics.rename(columns={"group": "duration_minutes"})
+    statistics.to_csv(results_dir / "stats_duration_streams.csv", index=False)
+    render_bar(
+        output_path,
+        statistics["duration_minutes"].astype(str),
+        statistics["mean"].values,
+        "Average Streams by Song Duration Range",
+        xlabel="Song Duration (minutes)",
+        ylabel="Average Streams",
+        figsize=(10, 5),
+        tick_rotation=90,
+        template_key="duration_bins",
+        errors=error_bar_sizes(statistics, "mean"))
+    remember_plot(output_path, fingerprint)
     print("Saved plot →", output_path)
 
 # correlation heatmap
 
 def correlation_heatmap(data, results_dir):
+    data = as_frame(data)
     streams_column = pick_streams_column(data)
     if streams_column is None:
         print("streams column missing")
@@ -363,6 +493,10 @@ def correlation_heatmap(data, results_dir):
     if small_data.empty:
         print("No numeric data for heatmap")
         return
+    output_path = results_dir / "correlation_heatmap.png"
+    fingerprint = plot_fingerprint(small_data)
+    if plot_is_cached(output_path, fingerprint):
+        return
     correlation_matrix = small_data.corr(numeric_only=True)
     fig, ax = plt.subplots(figsize=(10, 8))
     sns.heatmap(
@@ -375,9 +509,9 @@ def correlation_heatmap(data, results_dir):
     ax.set_title("Correlation Heatmap: Streams, Audio Features, Artist Stats")
     apply_spotify_style(ax)
     plt.tight_layout()
-    output_path = results_dir / "correlation_heatmap.png"
     plt.savefig(output_path)
     plt.close(fig)
+    remember_plot(output_path, fingerprint)
     print("Saved heatmap →", output_path)
 
 # pie chart
@@ -386,6 +520,10 @@ def explicit_pie_chart(data, results_dir):
     if "explicit" not in data.columns:
         print("explicit column missing")
         return
+    output_path = results_dir / "explicit_pie_chart.png"
+    fingerprint = plot_fingerprint(data["explicit"])
+    if plot_is_cached(output_path, fingerprint):
+        return
     explicit_counts = data["explicit"].value_counts(dropna=False)
     labels = []
     sizes = []
@@ -418,9 +556,9 @@ def explicit_pie_chart(data, results_dir):
     fig.patch.set_facecolor(bg_color)
     ax.set_facecolor(bg_color)
     plt.tight_layout()
-    output_path = results_dir / "explicit_pie_chart.png"
     plt.savefig(output_path)
     plt.close(fig)
+    remember_plot(output_path, fingerprint)
     print("Saved pie chart →", output_path)
 
 def load_data_youtube():
@@ -454,6 +592,10 @@ def spotify_vs_youtube_streams(data, results_dir):
     if clean.empty:
         print("No valid Spotify & YouTube rows")
         return
+    out_path = results_dir / "spotify_vs_youtube_streams.png"
+    fingerprint = plot_fingerprint(clean)
+    if plot_is_cached(out_path, fingerprint):
+        return
     fig, ax = plt.subplots(figsize=(7, 5))
     ax.scatter(clean["kworb_streams"], clean["Total Views"],
                color=spotify_green)
@@ -464,12 +606,16 @@ def spotify_vs_youtube_streams(data, results_dir):
     apply_spotify_style(ax)
     plt.tight_layout()
 
-    out_path = results_dir / "spotify_vs_youtube_streams.png"
     plt.savefig(out_path)
     plt.close(fig)
+    remember_plot(out_path, fingerprint)
     print("Saved plot →", out_path)
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the analyses and save plots")
+    parser.add_argument("--force",action="store_true",help="Re-render every plot even if its data is unchanged")
+    args, _ = parser.parse_known_args()
+    plot_cache["force"] = args.force
 
     data, data_dir, results_dir = load_data()
     if data is None:
@@ -480,12 +626,14 @@ def main():
     most_common_high_stream_words(data, results_dir)
     audio_profiles_top_vs_bottom(data, results_dir)
     tempo_distribution(data, results_dir)
+    tempo_band_streams(data, results_dir)
     duration_vs_streams(data, results_dir)
     correlation_heatmap(data, results_dir)
     explicit_pie_chart(data, results_dir)
     yt_data, yt_data_dir, yt_results_dir = load_data_youtube()
     if yt_data is not None:
         spotify_vs_youtube_streams(yt_data, results_dir)
+    print("Plot cache:", plot_cache["hits"], "unchanged,", plot_cache["misses"], "rendered")
     print("Analysis complete :)")
     print("Plots in:", results_dir)
 
@@ -0,0 +1,145 @@
+# src/analytics_store.py
+# loads every pipeline output into one SQLite file (data/pipeline.sqlite) with indexes on track ids and join keys
+# analyses can push group-bys / quantiles down to SQLite and only pull back the small result
+# every load also appends the kworb chart to kworb_history, one snapshot per day
+# usage:
+#   python -m src.analytics_store load
+#   python -m src.analytics_store query "SELECT COUNT(*) FROM spotify_kaggle"
+
+import os
+import sqlite3
+from contextlib import closing
+import argparse
+from datetime import date
+from pathlib import Path
+import pandas as pd
+from src.config import (data_folder,analytics_db_filename,kworb_output_filename,spotify_from_kworb_filename,spotify_kworb_kaggle1_filename,spotify_kworb_kaggle1_kaggle2_filename,kaggle_audio_subfolder,kaggle_youtube_subfolder)
+
+# table name → csv produced by that stage
+stage_tables = {
+    "kworb_top": kworb_output_filename,
+    "spotify_tracks": spotify_from_kworb_filename,
+    "spotify_kaggle": spotify_kworb_kaggle1_filename,
+    "spotify_youtube": spotify_kworb_kaggle1_kaggle2_filename,}
+
+kaggle_tables = {
+    "kaggle_audio": kaggle_audio_subfolder,
+    "kaggle_youtube": kaggle_youtube_subfolder,}
+
+index_columns = ["sp_track_id", "track_id", "merge_key", "_jn_name", "name_norm", "video_norm", "snapshot_date"]
+
+default_db_path = data_folder / analytics_db_filename
+
+
+def connect(db_path=default_db_path):
+    return sqlite3.connect(str(db_path))
+
+
+def create_indexes(connection, table_name, columns):
+    for column_name in index_columns:
+        if column_name in columns:
+            connection.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table_name}_{column_name}" ON "{table_name}" ("{column_name}")')
+
+
+def load_table(connection, table_name, data, if_exists="replace"):
+    data.to_sql(table_name, connection, if_exists=if_exists, index=False, chunksize=5000)
+    create_indexes(connection, table_name, data.columns)
+    connection.commit()
+    print("Loaded", len(data), "rows →", table_name)
+
+
+def first_csv(folder):
+    if not folder.exists():
+        return None
+    for file_name in sorted(os.listdir(folder)):
+        if file_name.lower().endswith(".csv"):
+            return folder / file_name
+    return None
+
+
+def append_kworb_snapshot(connection, kworb_data, snapshot_date=None):
+    snapshot_date = snapshot_date or date.today().isoformat()
+    snapshot = kworb_data.copy()
+    snapshot["snapshot_date"] = snapshot_date
+    table_exists = connection.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='kworb_history'").fetchone()
+    if table_exists:
+        connection.execute("DELETE FROM kworb_history WHERE snapshot_date = ?", (snapshot_date,))
+    load_table(connection, "kworb_history", snapshot, if_exists="append")
+
+
+def load_pipeline_outputs(db_path=default_db_path, include_kaggle=True):
+    # the inner "with connection" commits (or rolls back), closing() then releases the file
+    with closing(connect(db_path)) as connection, connection:
+        for table_name, file_name in stage_tables.items():
+            csv_path = data_folder / file_name
+            if csv_path.exists():
+                data = pd.read_csv(csv_path)
+                load_table(connection, table_name, data)
+                if table_name == "kworb_top":
+                    append_kworb_snapshot(connection, data)
+
+        if include_kaggle:
+            for table_name, subfolder in kaggle_tables.items():
+                csv_path = first_csv(data_folder / subfolder)
+                if csv_path is not None:
+                    load_table(connection, table_name, pd.read_csv(csv_path))
+    print("Analytics store:", db_path)
+
+
+def query(sql, params=(), db_path=default_db_path):
+    with closing(connect(db_path)) as connection:
+        return pd.read_sql_query(sql, connection, params=params)
+
+
+def group_mean(table_name, group_expression, value_column, db_path=default_db_path):
+    sql = f'''
+        SELECT {group_expression} AS grp, AVG("{value_column}") AS mean_value, COUNT("{value_column}") AS songs
+        FROM "{table_name}"
+        WHERE "{value_column}" IS NOT NULL AND {group_expression} IS NOT NULL
+        GROUP BY grp
+        ORDER BY grp'''
+    return query(sql, db_path=db_path)
+
+
+def streams_by_release_month(table_name="spotify_kaggle", streams_column="kworb_daily_streams", db_path=default_db_path):
+    # release_date is YYYY, YYYY-MM or YYYY-MM-DD
+    month = "CASE WHEN length(release_date) >= 7 THEN CAST(substr(release_date, 6, 2) AS INTEGER) END"
+    return group_mean(table_name, month, streams_column, db_path)
+
+
+def streams_by_duration_minutes(table_name="spotify_kaggle", duration_column="duration_ms_spotify", streams_column="kworb_daily_streams", db_path=default_db_path):
+    return group_mean(table_name, f'CAST("{duration_column}" / 60000 AS INTEGER)', streams_column, db_path)
+
+
+def quantile(table_name, column_name, q, db_path=default_db_path):
+    sql = f'''
+        SELECT "{column_name}" AS value FROM "{table_name}"
+        WHERE "{column_name}" IS NOT NULL
+        ORDER BY "{column_name}"
+        LIMIT 1 OFFSET (SELECT CAST((COUNT("{column_name}") - 1) * ? AS INTEGER) FROM "{table_name}")'''
+    result = query(sql, (q,), db_path)
+    if result.empty:
+        return None
+    return result["value"].iloc[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load pipeline outputs into SQLite and query them")
+    parser.add_argument("command",choices=["load", "query"],help="load all stage outputs, or run a SQL query")
+    parser.add_argument("sql",nargs="?",default=None,help="SQL for the query command")
+    parser.add_argument("--db",type=str,default=str(default_db_path),help="SQLite file (default: data/pipeline.sqlite)")
+    parser.add_argument("--skip-kaggle",action="store_true",help="Do not load the full Kaggle tables")
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    if args.command == "load":
+        load_pipeline_outputs(db_path, include_kaggle=not args.skip_kaggle)
+    else:
+        if not args.sql:
+            print("ERROR: query needs a SQL string")
+            return
+        print(query(args.sql, db_path=db_path).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,18 +18,46 @@ kworb_output_filename = "kworb_top_400.csv"
 spotify_token_url = "https://accounts.spotify.com/api/token"
 spotify_search_url = "https://api.spotify.com/v1/search"
 spotify_artists_url = "https://api.spotify.com/v1/artists"
+spotify_audio_features_url = "https://api.spotify.com/v1/audio-features"
 
 spotify_from_kworb_filename = "spotify_from_kworb_400.csv"
+track_index_filename = "track_index.csv"
+search_candidates = 5
 
 sleep_between_calls = 0.12
-checkpoint_every = 50
+
+max_retries = 4
+backoff_base_seconds = 0.6
+backoff_max_seconds = 30
+retry_budget_per_run = 200
+retryable_status_codes = [429, 500, 502, 503, 504]
+breaker_failure_threshold = 5
+breaker_pause_seconds = 30
+dead_letter_filename = "spotify_dead_letter.csv"
+
+enrichment_queue_filename = "enrichment_queue.sqlite"
+lease_batch_size = 25
+lease_seconds_default = 300
 get_artist_stats = True
 
+# every raw Kworb/Spotify response is kept in data/raw_archive (gzip segments + SQLite offset index)
+archive_raw_responses = True
+raw_archive_folder = "raw_archive"
+archive_segment_max_bytes = 64 * 1024 * 1024
+archive_compress_level = 6
+archive_read_workers = 4
+
+# spotify restricts /audio-features for newer apps, so this stage is opt-in
+fetch_spotify_audio_features = False
+audio_features_batch_size = 100
+spotify_audio_features_filename = "spotify_audio_features.csv"
+
 spotify_client_id = os.getenv("SPOTIFY_CLIENT_ID")
 spotify_client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
 
 kaggle_audio_dataset = "imuhammad/audio-features-and-lyrics-of-spotify-songs"
 kaggle_audio_subfolder = "kaggle_audio_lyrics"
+kaggle_cache_filename = "parsed_cache.pkl"
 
 spotify_kworb_kaggle1_filename = "spotify_kworb_kaggle1.csv"
 
@@ -37,11 +65,43 @@ kaggle_youtube_dataset = "asmonline/most-viewed-youtube-music-videos"
 kaggle_youtube_subfolder = "kaggle_youtube"
 
 spotify_kworb_kaggle1_kaggle2_filename = "spotify_kworb_kaggle1_kaggle2.csv"
+youtube_tried_filename = "youtube_tried_tracks.csv"
+
+analytics_db_filename = "pipeline.sqlite"
 
 spotify_green = "#1DB954"
 text_color = "black"
 bg_color = "white"
+plot_dpi = 100
+plot_png_compress_level = 6
+
+report_filename = "report.html"
+report_max_points = 2000
+report_scatter_bins = 40
+
+bootstrap_resamples = 10000
+resample_block_size = 500
+confidence_level = 0.95
+stats_seed = 510
+stats_workers = 1
 
 audio_feature_columns = ["danceability","energy","loudness","mode","speechiness","acousticness","instrumentalness","liveness","valence","tempo"]
+feature_matrix_columns = audio_feature_columns + ["kworb_streams", "kworb_daily_streams"]
+
+audio_matrix_filename = "audio_features.npy"
+audio_matrix_index_filename = "audio_features_index.csv"
+kaggle_matrix_filename = "kaggle_audio_features.npy"
+kaggle_matrix_index_filename = "kaggle_audio_features_index.csv"
+similarity_index_filename = "similarity_index.npz"
+
+minhash_permutations = 128
+lsh_bands = 32
+title_similarity_threshold = 0.7
+lyrics_similarity_threshold = 0.5
+lyrics_shingle_words = 3
+
+stream_model_filename = "stream_model.npz"
+stream_predictions_filename = "stream_predictions.csv"
+ridge_alpha = 1.0
 
 
@@ -0,0 +1,42 @@
+# src/feature_matrix.py
+# writes the audio features + streams as a contiguous float32 .npy matrix
+# with a small index CSV (one row per matrix row) next to it
+# np.load(mmap_mode="r") then gives a zero-copy read-only view that several processes can share
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.config import audio_feature_columns, feature_matrix_columns
+
+
+def write_feature_matrix(data, matrix_path, index_path, index_columns):
+    numeric = pd.DataFrame(index=data.index)
+    for column_name in feature_matrix_columns:
+        if column_name in data.columns:
+            numeric[column_name] = pd.to_numeric(data[column_name], errors="coerce")
+        else:
+            numeric[column_name] = np.nan
+
+    matrix = np.ascontiguousarray(numeric.to_numpy(dtype=np.float32))
+    np.save(matrix_path, matrix)
+
+    kept_index_columns = [c for c in index_columns if c in data.columns]
+    data[kept_index_columns].reset_index(drop=True).to_csv(index_path, index_label="row")
+    print("Saved feature matrix", matrix.shape, "→", matrix_path)
+
+
+def load_feature_matrix(matrix_path, index_path=None):
+    matrix = np.load(matrix_path, mmap_mode="r")
+    index_data = None
+    if index_path is not None and Path(index_path).exists():
+        index_data = pd.read_csv(index_path, index_col="row")
+    return matrix, index_data
+
+
+def matrix_to_frame(matrix):
+    # wraps the (possibly memory-mapped) matrix without copying it
+    return pd.DataFrame(matrix, columns=feature_matrix_columns, copy=False)
+
+
+def audio_block(matrix):
+    return matrix[:, :len(audio_feature_columns)]
@@ -0,0 +1,121 @@
+# src/genre_index.py
+# sparse song x genre incidence matrix built from the comma-joined artist_genres column
+# saved next to each dataset CSV as <name>_genres.npz + <name>_genre_vocabulary.csv (rows follow the CSV),
+# with a fingerprint of the genre column it was built from in <name>_genres.sha256
+# per-genre stream totals/means and audio profiles come from sparse matrix products
+# usage: python -m src.genre_index  → results/genre_aggregates.csv
+
+import time
+import hashlib
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.config import data_folder, results_folder, spotify_kworb_kaggle1_filename, audio_feature_columns
+
+
+def build_genre_index(data, genre_column="artist_genres"):
+    vocabulary = {}
+    row_numbers = []
+    genre_numbers = []
+    genre_strings = data[genre_column] if genre_column in data.columns else pd.Series([], dtype=object)
+    for row_number, genre_string in enumerate(genre_strings):
+        if not isinstance(genre_string, str):
+            continue
+        for genre in set(g.strip() for g in genre_string.split(",")):
+            if not genre:
+                continue
+            row_numbers.append(row_number)
+            genre_numbers.append(vocabulary.setdefault(genre, len(vocabulary)))
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(row_numbers), dtype=np.float32), (row_numbers, genre_numbers)),
+        shape=(len(data), len(vocabulary)))
+    return incidence, list(vocabulary)
+
+
+def genre_fingerprint(data, genre_column="artist_genres"):
+    # same idea as the plot cache: a hash of the values, so a refreshed CSV with the same row count is still caught
+    genre_strings = data[genre_column] if genre_column in data.columns else pd.Series([""] * len(data))
+    hashed = pd.util.hash_pandas_object(genre_strings.fillna("").astype(str), index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+
+def genre_index_paths(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + "_genres.npz"), csv_path.with_name(csv_path.stem + "_genre_vocabulary.csv"), csv_path.with_name(csv_path.stem + "_genres.sha256")
+
+
+def save_genre_index(incidence, vocabulary, csv_path, data):
+    matrix_path, vocabulary_path, fingerprint_path = genre_index_paths(csv_path)
+    sparse.save_npz(matrix_path, incidence)
+    pd.DataFrame({"genre": vocabulary}).to_csv(vocabulary_path, index_label="column")
+    fingerprint_path.write_text(genre_fingerprint(data))
+    print("Saved genre index", incidence.shape, "→", matrix_path)
+
+
+def load_genre_index(csv_path, data=None):
+    # (None, None) when the index is missing, or was built from different rows than data
+    matrix_path, vocabulary_path, fingerprint_path = genre_index_paths(csv_path)
+    if not matrix_path.exists() or not vocabulary_path.exists():
+        return None, None
+    if data is not None and (not fingerprint_path.exists() or fingerprint_path.read_text().strip() != genre_fingerprint(data)):
+        return None, None
+    incidence = sparse.load_npz(matrix_path).tocsr()
+    vocabulary = pd.read_csv(vocabulary_path, keep_default_na=False)["genre"].tolist()
+    return incidence, vocabulary
+
+
+def genre_aggregates(incidence, vocabulary, data, streams_column, feature_columns=None):
+    if feature_columns is None:
+        feature_columns = [c for c in audio_feature_columns if c in data.columns]
+    genre_by_song = incidence.T.tocsr()
+
+    value_columns = [streams_column] + feature_columns
+    values = data[value_columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    present = ~np.isnan(values)
+
+    # one product for the sums, one for how many songs had a value in each column
+    sums = genre_by_song @ np.where(present, values, 0.0)
+    counts = genre_by_song @ present.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    aggregates = pd.DataFrame(means[:, 1:], index=pd.Index(vocabulary, name="genre"), columns=feature_columns)
+    aggregates.insert(0, "songs", np.asarray(incidence.sum(axis=0)).ravel().astype(int))
+    aggregates.insert(1, "total_streams", sums[:, 0])
+    aggregates.insert(2, "mean_streams", means[:, 0])
+    return aggregates.sort_values("total_streams", ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-genre stream totals, means and audio profiles")
+    parser.add_argument("--data",type=str,default=str(data_folder / spotify_kworb_kaggle1_filename),help="Dataset CSV the genre index was saved with")
+    parser.add_argument("--out",type=str,default=str(results_folder / "genre_aggregates.csv"),help="Output CSV")
+    args = parser.parse_args()
+
+    data_path = Path(args.data)
+    if not data_path.exists():
+        print("ERROR:", data_path, "not found")
+        return
+    data = pd.read_csv(data_path)
+
+    incidence, vocabulary = load_genre_index(data_path, data)
+    if incidence is None:
+        print("Genre index missing or stale, rebuilding")
+        incidence, vocabulary = build_genre_index(data)
+        save_genre_index(incidence, vocabulary, data_path, data)
+
+    streams_column = "kworb_streams" if "kworb_streams" in data.columns else "Streams"
+    start = time.perf_counter()
+    aggregates = genre_aggregates(incidence, vocabulary, data, streams_column)
+    print(f"Aggregated {len(vocabulary)} genres over {len(data)} songs in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    aggregates.to_csv(args.out)
+    print("Saved genre aggregates →", args.out)
+
+
+if __name__ == "__main__":
+    main()
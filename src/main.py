@@ -3,51 +3,165 @@
 # scrape Kworb Top 1000 (originally 400 songs (hence filename), but wanted more data to analyse) 
 # pull Spotify metadata for those 1000
 # download kaggle audio+lyrics & merge
+# both kaggle datasets are fetched in the background while the spotify pull runs
+# --incremental: reuse cached kaggle tables and previous merges, only new songs are matched
+# --offline: rebuild the scrape and spotify outputs from the raw response archive and use the cached kaggle tables (no network)
+#   a kaggle merge whose cached table is missing is skipped, never downloaded
 
+import sys
+import time
+import argparse
 from pathlib import Path
-from src.config import data_folder
+from concurrent.futures import ThreadPoolExecutor
+from src.config import (data_folder,kaggle_audio_dataset,kaggle_audio_subfolder,kaggle_youtube_dataset,kaggle_youtube_subfolder,kaggle_cache_filename,spotify_from_kworb_filename,spotify_audio_features_filename,fetch_spotify_audio_features,spotify_kworb_kaggle1_filename,spotify_kworb_kaggle1_kaggle2_filename)
 
-def run_scraper():
+stage_times = {}
+
+def timed(stage_name, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    stage_times[stage_name] = (start, time.perf_counter())
+    return result
+
+def kaggle_cache_missing(subfolder, offline):
+    return offline and not (data_folder / subfolder / kaggle_cache_filename).exists()
+
+def start_kaggle_prefetch(executor, incremental=False, offline=False):
+    try:
+        from src.merge_spotify_kaggle1 import get_kaggle_data
+        from src.merge_spotify_youtube import get_kaggle_youtube_data
+    except Exception as error:
+        print("Could not start Kaggle prefetch:", error)
+        return None, None
+    print("Prefetching Kaggle datasets in the background")
+    audio_future = youtube_future = None
+    # offline: nothing to prefetch without a cached table, run_merge reports the skip
+    if not kaggle_cache_missing(kaggle_audio_subfolder, offline):
+        audio_future = executor.submit(timed, "prefetch kaggle audio", get_kaggle_data, kaggle_audio_dataset, str(data_folder / kaggle_audio_subfolder), incremental or offline)
+    if not kaggle_cache_missing(kaggle_youtube_subfolder, offline):
+        youtube_future = executor.submit(timed, "prefetch kaggle youtube", get_kaggle_youtube_data, kaggle_youtube_dataset, str(data_folder / kaggle_youtube_subfolder), incremental or offline)
+    return audio_future, youtube_future
+
+def wait_for(future, label):
+    if future is None:
+        return None
+    start = time.perf_counter()
+    data = future.result()
+    waited = time.perf_counter() - start
+    print(f"{label} ready (waited {waited:.1f}s)")
+    return data
+
+def overlap_seconds(first, second):
+    return max(0.0, min(first[1], second[1]) - max(first[0], second[0]))
+
+def print_stage_summary():
+    print("Stage timings:")
+    for stage_name, (start, end) in stage_times.items():
+        print(f"  {stage_name}: {end - start:.1f}s")
+    pull_window = stage_times.get("spotify pull")
+    if pull_window is None:
+        return
+    for stage_name in ["prefetch kaggle audio", "prefetch kaggle youtube"]:
+        if stage_name in stage_times:
+            overlap = overlap_seconds(pull_window, stage_times[stage_name])
+            print(f"  {stage_name} overlapped spotify pull by {overlap:.1f}s")
+
+def stage_argv(offline):
+    sys.argv = sys.argv[:1] + (["--from-archive"] if offline else [])
+
+def run_scraper(offline=False):
     from src.scrape_kworb_top400 import main as scrape_main
     print("Step 1: Scraping Kworb Top 400")
+    stage_argv(offline)
     scrape_main()
     print("Kworb CSV created.\n")
 
-def run_spotify_pull():
+def run_spotify_pull(offline=False):
     try:
         from src.pull_spotify_kworb400 import main as pull_main
     except ModuleNotFoundError:
         from src.pull_spotify_kworb400_simple import main as pull_main
 
     print("Step 2: Pulling Spotify data for 400 songs")
+    stage_argv(offline)
     pull_main()
     print("Spotify CSV created.\n")
 
-def run_merge():
-    from src.merge_spotify_kaggle1 import main as merge_main
+def run_audio_features_pull(offline=False):
+    from src.pull_spotify_audio_features import main as features_main
+    print("Step 2b: Fetching Spotify audio features in batches")
+    stage_argv(offline)
+    features_main()
+    print("Spotify audio features CSV created.\n")
+
+def run_merge(kaggle_data=None, incremental=False, offline=False):
+    from src.merge_spotify_kaggle1 import get_kaggle_data, merge_spotify_and_kaggle, merge_spotify_and_kaggle_incremental
     print("Step 3: downloading Kaggle data and merging with Spotify/Kworb")
-    merge_main()
+    if kaggle_data is None and kaggle_cache_missing(kaggle_audio_subfolder, offline):
+        print("Offline: no cached Kaggle audio table in", data_folder / kaggle_audio_subfolder, "- skipping the merge")
+        return
+    if kaggle_data is None:
+        kaggle_data = get_kaggle_data(kaggle_audio_dataset, str(data_folder / kaggle_audio_subfolder), incremental or offline)
+    if kaggle_data is None:
+        print("Could not load Kaggle data")
+        return
+    merge_function = merge_spotify_and_kaggle_incremental if incremental else merge_spotify_and_kaggle
+    merge_function(data_folder / spotify_from_kworb_filename, kaggle_data, data_folder / spotify_kworb_kaggle1_filename, data_folder / spotify_audio_features_filename)
     print("Merged CSV created (spotify_kworb_kaggle1.csv).\n")
 
-def run_merge_youtube():
-    from src.merge_spotify_youtube import main as yt_main
+def run_merge_youtube(youtube_data=None, incremental=False, offline=False):
+    from src.merge_spotify_youtube import get_kaggle_youtube_data, merge_spotify_youtube, merge_spotify_youtube_incremental
     print("Step 4: Downloing youtube Kaggle data and merging with spotify_kworb_kaggle1")
-    yt_main()
+    if youtube_data is None and kaggle_cache_missing(kaggle_youtube_subfolder, offline):
+        print("Offline: no cached Kaggle YouTube table in", data_folder / kaggle_youtube_subfolder, "- skipping the merge")
+        return
+    if youtube_data is None:
+        youtube_data = get_kaggle_youtube_data(kaggle_youtube_dataset, str(data_folder / kaggle_youtube_subfolder), incremental or offline)
+    if youtube_data is None:
+        print("Could not load YouTube data")
+        return
+    merge_function = merge_spotify_youtube_incremental if incremental else merge_spotify_youtube
+    merge_function(data_folder / spotify_kworb_kaggle1_filename, youtube_data, data_folder / spotify_kworb_kaggle1_kaggle2_filename)
     print("Final merged CSV created: spotify_kworb_kaggle1_kaggle2.csv\n")
 
+def run_store_load():
+    from src.analytics_store import load_pipeline_outputs
+    print("Step 5: Loading stage outputs into the analytics store")
+    load_pipeline_outputs()
+    print("Analytics store updated\n")
+
 def run_analysis():
     from src.analysis_spotify import main as analysis_main
-    print("Step 5: Running analysis on final merged dataset")
+    print("Step 6: Running analysis on final merged dataset")
     analysis_main()
+    from src.report_html import main as report_main
+    report_main()
     print("Analysis complete\n")
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the whole pipeline")
+    parser.add_argument("--incremental",action="store_true",help="Nightly refresh: only new songs are enriched and merged, stream counts are updated in place")
+    parser.add_argument("--offline",action="store_true",help="Rebuild every output from the raw response archive and cached Kaggle tables, without the network")
+    args = parser.parse_args()
+    # each stage parses sys.argv itself
+    sys.argv = sys.argv[:1]
+    incremental = args.incremental
+    offline = args.offline
+
     data_folder.mkdir(parents=True, exist_ok=True)
-    run_scraper()
-    run_spotify_pull()
-    run_merge()
-    run_merge_youtube()
-    run_analysis()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        audio_future, youtube_future = start_kaggle_prefetch(executor, incremental, offline)
+        timed("scrape", run_scraper, offline)
+        timed("spotify pull", run_spotify_pull, offline)
+        if fetch_spotify_audio_features:
+            timed("spotify audio features", run_audio_features_pull, offline)
+        kaggle_data = wait_for(audio_future, "Kaggle audio data")
+        timed("merge kaggle audio", run_merge, kaggle_data, incremental, offline)
+        youtube_data = wait_for(youtube_future, "Kaggle YouTube data")
+        timed("merge youtube", run_merge_youtube, youtube_data, incremental, offline)
+    timed("analytics store", run_store_load)
+    timed("analysis", run_analysis)
+    print_stage_summary()
 
     print("Finished.")
     print("Data folder:", data_folder)
@@ -3,17 +3,26 @@
 # download Kaggle dataset: "Audio features and lyrics of Spotify songs"
 # merge with spotify_from_kworb_400.csv
 # save merged as spotify_kworb_kaggle1.csv
+# --incremental keeps the previous merged rows (with refreshed stream counts) and only matches new songs
 
 import os
 from pathlib import Path
 import argparse
 import kaggle
 import pandas as pd
-from src.config import (data_folder,kaggle_audio_dataset,kaggle_audio_subfolder,spotify_from_kworb_filename,spotify_kworb_kaggle1_filename)
+from src.config import (data_folder,kaggle_audio_dataset,kaggle_audio_subfolder,kaggle_cache_filename,spotify_from_kworb_filename,spotify_kworb_kaggle1_filename,spotify_audio_features_filename,audio_matrix_filename,audio_matrix_index_filename,kaggle_matrix_filename,kaggle_matrix_index_filename)
+from src.feature_matrix import write_feature_matrix
+from src.genre_index import build_genre_index, save_genre_index
+from src.near_duplicates import add_kaggle_version_columns
 
 
 
-def get_kaggle_data(dataset_name, extract_folder):
+def get_kaggle_data(dataset_name, extract_folder, use_cache=False):
+    cache_path = Path(extract_folder) / kaggle_cache_filename
+    if use_cache and cache_path.exists():
+        print("Loading cached Kaggle data:", cache_path)
+        return pd.read_pickle(cache_path)
+
     print("Loading data from Kaggle:", dataset_name)
 
     try:
@@ -31,6 +40,9 @@ def get_kaggle_data(dataset_name, extract_folder):
 
         csv_file = os.path.join(extract_folder, csv_files[0])
         kaggle_data = pd.read_csv(csv_file)
+        # version clusters are computed once per download and cached with the table
+        kaggle_data = add_kaggle_version_columns(kaggle_data)
+        kaggle_data.to_pickle(cache_path)
         return kaggle_data
 
     except Exception as error:
@@ -45,38 +57,160 @@ def normalize_text(value):
         return ""
 
 
-def merge_spotify_and_kaggle(spotify_file, kaggle_data, output_file):
-    spotify_path = Path(spotify_file)
-    if not spotify_path.exists():
-        print("Error: Spotify file not found:", spotify_path)
-        return
+def merge_on_track_id(spotify_data, kaggle_data):
+    # returns (rows matched on sp_track_id, spotify rows left over for the name join)
+    if "sp_track_id" not in spotify_data.columns or "track_id" not in kaggle_data.columns:
+        return pd.DataFrame(), spotify_data
+
+    kaggle_by_id = (
+        kaggle_data.dropna(subset=["track_id"])
+        .drop_duplicates(subset=["track_id"], keep="first")
+        .drop(columns=["merge_key"])
+        .set_index("track_id", drop=False))
+
+    has_id = spotify_data["sp_track_id"].isin(kaggle_by_id.index)
+    id_matched = spotify_data[has_id].drop_duplicates(subset=["sp_track_id"], keep="first")
+    id_matched = id_matched.join(kaggle_by_id, on="sp_track_id", how="inner", lsuffix="_spotify", rsuffix="_kaggle")
+    id_matched["match_method"] = "track_id"
+
+    return id_matched, spotify_data[~has_id]
+
+
+def merge_on_api_features(unmatched_spotify, audio_features_file, suffixed_columns):
+    # songs the kaggle table does not have, using features fetched by pull_spotify_audio_features
+    if audio_features_file is None or not Path(audio_features_file).exists():
+        return pd.DataFrame()
+    audio_features = pd.read_csv(audio_features_file).drop_duplicates(subset=["sp_track_id"], keep="last")
+    api_matched = pd.merge(unmatched_spotify, audio_features, on="sp_track_id", how="inner")
+    # same column names as rows that went through the kaggle join
+    api_matched = api_matched.rename(columns={c: c + "_spotify" for c in suffixed_columns})
+    api_matched["match_method"] = "spotify_api"
+    return api_matched
 
-    spotify_data = pd.read_csv(spotify_path)
 
+def check_columns(spotify_data, kaggle_data):
     for column_name in ["name", "artist_names"]:
         if column_name not in spotify_data.columns:
             print("Error: Spotify file is missing column:", column_name)
-            return
+            return False
 
     for column_name in ["track_name", "track_artist"]:
         if column_name not in kaggle_data.columns:
             print("Error: Kaggle data is missing column:", column_name)
-            return
+            return False
+    return True
 
+
+def merge_frames(spotify_data, kaggle_data, audio_features_file=None):
+    spotify_data = spotify_data.copy()
     spotify_data["primary_artist"] = (spotify_data["artist_names"].astype(str).str.split(",", n=1).str[0])
 
     spotify_data["merge_key"] = (spotify_data["name"].apply(normalize_text)+ " - "+ spotify_data["primary_artist"].apply(normalize_text))
-    kaggle_data["merge_key"] = (kaggle_data["track_name"].apply(normalize_text)+ " - "+ kaggle_data["track_artist"].apply(normalize_text))
+    if "merge_key" not in kaggle_data.columns:
+        kaggle_data["merge_key"] = (kaggle_data["track_name"].apply(normalize_text)+ " - "+ kaggle_data["track_artist"].apply(normalize_text))
+    if "version_rank" not in kaggle_data.columns:
+        kaggle_data = add_kaggle_version_columns(kaggle_data)
+    # canonical versions first, so every drop_duplicates below keeps the canonical row
+    kaggle_data = kaggle_data.sort_values("version_rank", kind="stable")
+
+    # join on the spotify track id first, then fall back to the name key for whatever is left
+    id_matched, unmatched_spotify = merge_on_track_id(spotify_data, kaggle_data)
+
+    name_matched = pd.merge(unmatched_spotify,kaggle_data,on="merge_key",how="inner",suffixes=("_spotify", "_kaggle"),)
+    name_matched = name_matched.sort_values("version_rank", kind="stable").drop_duplicates(subset=["merge_key"], keep="first")
+    name_matched["match_method"] = "name"
+
+    still_unmatched = unmatched_spotify[~unmatched_spotify["merge_key"].isin(name_matched["merge_key"])]
+    suffixed_columns = [c for c in spotify_data.columns if c in kaggle_data.columns and c != "merge_key"]
+    api_matched = merge_on_api_features(still_unmatched, audio_features_file, suffixed_columns)
+
+    # unmatched from the rows left over, so repeats of an already matched song are not counted as misses
+    unmatched = still_unmatched
+    if not api_matched.empty:
+        unmatched = still_unmatched[~still_unmatched["sp_track_id"].isin(api_matched["sp_track_id"])]
+    repeats = len(spotify_data) - len(id_matched) - len(name_matched) - len(api_matched) - len(unmatched)
+
+    print("Matched by track id:", len(id_matched))
+    print("Matched by name:", len(name_matched))
+    if audio_features_file is not None:
+        print("Matched by Spotify audio features:", len(api_matched))
+    print("Repeats of a matched song:", repeats)
+    print("Unmatched:", len(unmatched))
+
+    merged_data = pd.concat([id_matched, name_matched, api_matched], ignore_index=True)
+    merged_data = merged_data.drop_duplicates(subset=["merge_key"], keep="first")
+    return merged_data
 
-    merged_data = pd.merge(spotify_data,kaggle_data,on="merge_key",how="inner",suffixes=("_spotify", "_kaggle"),)
 
-    rows_before = len(merged_data)
-    merged_data = merged_data.drop_duplicates(subset=["merge_key"], keep="first")
-    rows_after = len(merged_data)
+def write_merge_outputs(merged_data, kaggle_data, output_path):
+    merged_data.to_csv(output_path, index=False)
+
+    # song x genre incidence matrix, rows in the same order as the CSV
+    incidence, vocabulary = build_genre_index(merged_data)
+    save_genre_index(incidence, vocabulary, output_path, merged_data)
+
+    # float32 copies of the audio features for fast memory-mapped loads
+    write_feature_matrix(merged_data, output_path.parent / audio_matrix_filename, output_path.parent / audio_matrix_index_filename, ["sp_track_id", "track_id", "name", "artist_names"])
+    write_feature_matrix(kaggle_data, output_path.parent / kaggle_matrix_filename, output_path.parent / kaggle_matrix_index_filename, ["track_id", "track_name", "track_artist"])
+
+
+def merge_spotify_and_kaggle(spotify_file, kaggle_data, output_file, audio_features_file=None):
+    spotify_path = Path(spotify_file)
+    if not spotify_path.exists():
+        print("Error: Spotify file not found:", spotify_path)
+        return
+
+    spotify_data = pd.read_csv(spotify_path)
+    if not check_columns(spotify_data, kaggle_data):
+        return
+
+    merged_data = merge_frames(spotify_data, kaggle_data, audio_features_file)
+    write_merge_outputs(merged_data, kaggle_data, Path(output_file))
+
+
+# merge_frames tries the joins in this order and keeps the first row per merge key
+match_method_priority = {"track_id": 0, "name": 1, "spotify_api": 2}
+
+
+def refresh_stream_counts(previous_rows, spotify_data):
+    streams = spotify_data.drop_duplicates(subset=["sp_track_id"]).set_index("sp_track_id")
+    for column_name in ["kworb_streams", "kworb_daily_streams"]:
+        if column_name in previous_rows.columns and column_name in streams.columns:
+            previous_rows[column_name] = previous_rows["sp_track_id"].map(streams[column_name])
+    return previous_rows
+
 
+def merge_spotify_and_kaggle_incremental(spotify_file, kaggle_data, output_file, audio_features_file=None):
+    spotify_path = Path(spotify_file)
     output_path = Path(output_file)
+    if not output_path.exists() or not spotify_path.exists():
+        return merge_spotify_and_kaggle(spotify_file, kaggle_data, output_file, audio_features_file)
+
+    spotify_data = pd.read_csv(spotify_path)
+    if not check_columns(spotify_data, kaggle_data):
+        return
+    previous = pd.read_csv(output_path)
+
+    # songs still on the chart keep their merged row, only the stream counts move
+    kept = previous[previous["sp_track_id"].isin(spotify_data["sp_track_id"])].copy()
+    kept = refresh_stream_counts(kept, spotify_data)
+    new_songs = spotify_data[~spotify_data["sp_track_id"].isin(previous["sp_track_id"])]
+    print("Incremental merge: kept", len(kept), "| dropped", len(previous) - len(kept), "| matching", len(new_songs), "new or previously unmatched")
+
+    merged_new = merge_frames(new_songs, kaggle_data, audio_features_file) if not new_songs.empty else pd.DataFrame()
+    merged_data = pd.concat([kept, merged_new], ignore_index=True)
+
+    order = pd.Series(range(len(spotify_data)), index=spotify_data["sp_track_id"].values)
+    order = order[~order.index.duplicated()]
+    merged_data["__order"] = merged_data["sp_track_id"].map(order)
+    # a new song can share a merge key with a kept one: keep the row a full rebuild would keep
+    merged_data["__method"] = merged_data["match_method"].map(match_method_priority) if "match_method" in merged_data.columns else 0
+    merged_data = merged_data.sort_values(["__method", "__order"], kind="stable").drop_duplicates(subset=["merge_key"], keep="first")
+
+    # back in kworb order
+    merged_data = merged_data.sort_values("__order", kind="stable").drop(columns=["__order", "__method"])
+    write_merge_outputs(merged_data.reset_index(drop=True), kaggle_data, output_path)
 
-    merged_data.to_csv(output_path, index=False)
 
 def main():
     parser = argparse.ArgumentParser(description="Download Kaggle audio+lyrics data and merge with Spotify Kworb data")
@@ -84,13 +218,18 @@ def main():
     parser.add_argument("--extract-dir",type=str,default=str(data_folder / kaggle_audio_subfolder),help="Folder to extract Kaggle files into")
     parser.add_argument("--spotify",type=str,default=str(data_folder / spotify_from_kworb_filename),help="Path to Spotify+Kworb CSV")
     parser.add_argument("--out",type=str,default=str(data_folder / spotify_kworb_kaggle1_filename),help="Output CSV path")
+    parser.add_argument("--incremental",action="store_true",help="Reuse the cached Kaggle table and previous merge, only match new songs")
+    parser.add_argument("--audio-features",type=str,default=str(data_folder / spotify_audio_features_filename),help="Optional Spotify audio features CSV for songs missing from Kaggle")
     args = parser.parse_args()
-    kaggle_data = get_kaggle_data(args.dataset, args.extract_dir)
+    kaggle_data = get_kaggle_data(args.dataset, args.extract_dir, use_cache=args.incremental)
     if kaggle_data is None:
         print("Could not load Kaggle data")
         return
 
-    merge_spotify_and_kaggle(args.spotify, kaggle_data, args.out)
+    if args.incremental:
+        merge_spotify_and_kaggle_incremental(args.spotify, kaggle_data, args.out, args.audio_features)
+    else:
+        merge_spotify_and_kaggle(args.spotify, kaggle_data, args.out, args.audio_features)
 
 
 if __name__ == "__main__":
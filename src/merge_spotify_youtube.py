@@ -1,14 +1,22 @@
 # src/merge_spotify_youtube.py
 # combines spotify_kworb_kaggle1.csv with Kaggle "Most Viewed YouTube Music Videos"
+# --incremental keeps the previous final rows (with refreshed stream counts) and only matches songs never tried before
+# the tried spotify track ids are saved next to the output, so unmatched songs are not re-scanned every night
 
 import os
 from pathlib import Path
 import argparse
 import kaggle
 import pandas as pd
-from src.config import (data_folder,kaggle_youtube_dataset,kaggle_youtube_subfolder,spotify_kworb_kaggle1_filename,spotify_kworb_kaggle1_kaggle2_filename)
+from src.config import (data_folder,kaggle_youtube_dataset,kaggle_youtube_subfolder,kaggle_cache_filename,spotify_kworb_kaggle1_filename,spotify_kworb_kaggle1_kaggle2_filename,youtube_tried_filename)
+from src.near_duplicates import keep_canonical_versions
+
+def get_kaggle_youtube_data(dataset_name, extract_folder, use_cache=False):
+    cache_path = Path(extract_folder) / kaggle_cache_filename
+    if use_cache and cache_path.exists():
+        print("Loading cached YouTube data:", cache_path)
+        return pd.read_pickle(cache_path)
 
-def get_kaggle_youtube_data(dataset_name, extract_folder):
     try:
         kaggle.api.dataset_download_files(dataset_name,path=extract_folder,unzip=True,)
 
@@ -23,6 +31,7 @@ def get_kaggle_youtube_data(dataset_name, extract_folder):
 
         csv_path = os.path.join(extract_folder, csv_files[0])
         youtube_data = pd.read_csv(csv_path)
+        youtube_data.to_pickle(cache_path)
         return youtube_data
 
     except Exception as error:
@@ -36,23 +45,11 @@ def normalize_text(value):
         return ""
 
 
-def merge_spotify_youtube(spotify_csv_path, youtube_data, output_csv_path):
-    spotify_path = Path(spotify_csv_path)
-    if not spotify_path.exists():
-        print("Error:", spotify_path, "does not exist")
-        return
-
-    spotify_data = pd.read_csv(spotify_path)
-
-    if "name" not in spotify_data.columns:
-        print("Error: Spotify dataset missing 'name' column")
-        return
-    if "Video" not in youtube_data.columns:
-        print("Error: YouTube dataset missing 'Video' column")
-        return
-
+def match_youtube_rows(spotify_data, youtube_data):
+    spotify_data = spotify_data.copy()
     spotify_data["name_norm"] = spotify_data["name"].apply(normalize_text)
-    youtube_data["video_norm"] = youtube_data["Video"].apply(normalize_text)
+    if "video_norm" not in youtube_data.columns:
+        youtube_data["video_norm"] = youtube_data["Video"].apply(normalize_text)
 
     merged_rows = []
     for index, spotify_row in spotify_data.iterrows():
@@ -67,14 +64,92 @@ def merge_spotify_youtube(spotify_csv_path, youtube_data, output_csv_path):
                 combined_row.update(youtube_row.to_dict())
                 merged_rows.append(combined_row)
 
-    merged_data = pd.DataFrame(merged_rows)
+    return pd.DataFrame(merged_rows)
+
+
+def tried_path(output_path):
+    return Path(output_path).with_name(youtube_tried_filename)
+
+
+def save_tried_tracks(output_path, track_ids):
+    pd.DataFrame({"sp_track_id": sorted(set(track_ids))}).to_csv(tried_path(output_path), index=False)
+
+
+def load_tried_tracks(output_path):
+    path = tried_path(output_path)
+    if not path.exists():
+        return None
+    return set(pd.read_csv(path, dtype={"sp_track_id": str})["sp_track_id"])
+
+
+def check_columns(spotify_data, youtube_data):
+    if "name" not in spotify_data.columns:
+        print("Error: Spotify dataset missing 'name' column")
+        return False
+    if "Video" not in youtube_data.columns:
+        print("Error: YouTube dataset missing 'Video' column")
+        return False
+    return True
+
+
+def merge_spotify_youtube(spotify_csv_path, youtube_data, output_csv_path):
+    spotify_path = Path(spotify_csv_path)
+    if not spotify_path.exists():
+        print("Error:", spotify_path, "does not exist")
+        return
+
+    spotify_data = pd.read_csv(spotify_path)
+    if not check_columns(spotify_data, youtube_data):
+        return
+
+    merged_data = match_youtube_rows(spotify_data, youtube_data)
     merged_data.drop_duplicates(inplace=True)
 
     if "name" in merged_data.columns:
-        merged_data.drop_duplicates(subset=["name"], keep="first", inplace=True)
+        merged_data = keep_canonical_versions(merged_data, "name", "artist_names", "lyrics", ["Total Views"], "release_date")
 
     output_path = Path(output_csv_path)
     merged_data.to_csv(output_path, index=False)
+    if "sp_track_id" in spotify_data.columns:
+        save_tried_tracks(output_path, spotify_data["sp_track_id"].dropna().astype(str))
+    print("Saved merged dataset as:", output_path)
+
+
+def merge_spotify_youtube_incremental(spotify_csv_path, youtube_data, output_csv_path):
+    spotify_path = Path(spotify_csv_path)
+    output_path = Path(output_csv_path)
+    if not output_path.exists() or not spotify_path.exists():
+        return merge_spotify_youtube(spotify_csv_path, youtube_data, output_csv_path)
+
+    spotify_data = pd.read_csv(spotify_path)
+    if not check_columns(spotify_data, youtube_data):
+        return
+    previous = pd.read_csv(output_path)
+    tried = load_tried_tracks(output_path)
+    if "sp_track_id" not in previous.columns or "sp_track_id" not in spotify_data.columns or tried is None:
+        return merge_spotify_youtube(spotify_csv_path, youtube_data, output_csv_path)
+
+    # songs still in the merged set keep their youtube match, only the stream counts move
+    kept = previous[previous["sp_track_id"].isin(spotify_data["sp_track_id"])].copy()
+    streams = spotify_data.drop_duplicates(subset=["sp_track_id"]).set_index("sp_track_id")
+    for column_name in ["kworb_streams", "kworb_daily_streams"]:
+        if column_name in kept.columns and column_name in streams.columns:
+            kept[column_name] = kept["sp_track_id"].map(streams[column_name])
+
+    # songs already tried against this youtube table either matched (kept above) or never will
+    spotify_ids = spotify_data["sp_track_id"].astype(str)
+    new_songs = spotify_data[~spotify_ids.isin(tried)]
+    print("Incremental YouTube merge: kept", len(kept), "| matching", len(new_songs), "new songs")
+    merged_new = match_youtube_rows(new_songs, youtube_data) if not new_songs.empty else pd.DataFrame()
+
+    merged_data = pd.concat([kept, merged_new], ignore_index=True)
+    merged_data.drop_duplicates(inplace=True)
+    if "name" in merged_data.columns:
+        merged_data = keep_canonical_versions(merged_data, "name", "artist_names", "lyrics", ["Total Views"], "release_date")
+
+    merged_data.to_csv(output_path, index=False)
+    # songs that left the chart are forgotten, so a comeback is matched again
+    save_tried_tracks(output_path, spotify_ids.dropna())
     print("Saved merged dataset as:", output_path)
 
 def main():
@@ -83,13 +158,17 @@ def main():
     parser.add_argument("--extract-dir",type=str,default=str(data_folder / kaggle_youtube_subfolder),help="Directory where Kaggle files are downloaded",)
     parser.add_argument("--spotify",type=str,default=str(data_folder / spotify_kworb_kaggle1_filename),help="Merged spotify+kworb+kaggle1 file",)
     parser.add_argument("--out",type=str,default=str(data_folder / spotify_kworb_kaggle1_kaggle2_filename),help="Final merged output file",)
+    parser.add_argument("--incremental",action="store_true",help="Reuse the cached YouTube table and previous merge, only match new songs",)
     args = parser.parse_args()
-    youtube_data = get_kaggle_youtube_data(args.dataset, args.extract_dir)
+    youtube_data = get_kaggle_youtube_data(args.dataset, args.extract_dir, use_cache=args.incremental)
     if youtube_data is None:
         print("Could not load YouTube data")
         return
 
-    merge_spotify_youtube(args.spotify, youtube_data, args.out)
+    if args.incremental:
+        merge_spotify_youtube_incremental(args.spotify, youtube_data, args.out)
+    else:
+        merge_spotify_youtube(args.spotify, youtube_data, args.out)
 
 
 if __name__ == "__main__":
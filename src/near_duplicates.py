@@ -0,0 +1,231 @@
+# src/near_duplicates.py
+# near-duplicate detection for versions of the same song (remasters, single vs album, playlist copies)
+# titles (version tags stripped) are shingled into character 3-grams, lyrics into word 3-grams
+# MinHash signatures + an LSH index on the titles (bucketed per artist) give candidate pairs without comparing every pair,
+# a pair is a duplicate when the estimated title similarity passes the threshold and, if both songs have lyrics,
+# the estimated lyrics similarity does too; connected components of those pairs are the version clusters
+#
+# canonical version of a cluster (version_rank 0):
+#   1. fewest alternate-version words in the raw title (live, remix, remaster, ...)
+#   2. highest popularity (first popularity column present)
+#   3. earliest release date
+#   4. first row in the table
+#
+# usage (clusters + timing on the cached Kaggle table): python -m src.near_duplicates
+
+import re
+import time
+import argparse
+import itertools
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from src.config import (data_folder,kaggle_audio_subfolder,kaggle_cache_filename,minhash_permutations,lsh_bands,title_similarity_threshold,lyrics_similarity_threshold,lyrics_shingle_words)
+from src.track_index import normalize_text, version_words, matched_version_words
+
+canonical_penalty_words = version_words + ["remaster", "deluxe", "mono", "stereo"]
+
+empty_signature = np.iinfo(np.uint32).max
+shingles_per_block = 50000
+
+
+def normalize_title(title):
+    title = normalize_text(title)
+    title = re.sub(r"\(.*?\)|\[.*?\]", " ", title)
+    title = title.split(" - ")[0]
+    title = re.sub(r"\b(feat|ft)\..*$", " ", title)
+    title = re.sub(r"[^\w\s]", " ", title)
+    return " ".join(title.split())
+
+
+def title_tokens(title):
+    return list(normalize_title(title))
+
+
+def lyrics_tokens(lyrics):
+    return re.sub(r"[^\w\s]", " ", normalize_text(lyrics)).split()
+
+
+def shingle_codes(token_lists, n):
+    # n-grams of every document as integers: (codes, owner document of each code), grouped by document
+    # tokens are factorized once over the whole table, so no per-shingle string hashing;
+    # repeated shingles are left in, the minimum over them is the same
+    padded = [tokens + [""] * (n - len(tokens)) if 0 < len(tokens) < n else tokens for tokens in token_lists]
+    lengths = np.array([len(tokens) for tokens in padded], dtype=np.int64)
+    token_ids, vocabulary = pd.factorize(pd.Series([t for tokens in padded for t in tokens], dtype=object))
+    token_ids = token_ids.astype(np.uint64)
+    owners = np.repeat(np.arange(len(padded)), lengths)
+
+    gram_count = max(len(token_ids) - n + 1, 0)
+    codes = np.zeros(gram_count, dtype=np.uint64)
+    for offset in range(n):
+        codes = codes * np.uint64(len(vocabulary) + 1) + token_ids[offset:offset + gram_count]
+    gram_owners = owners[:gram_count]
+    inside = gram_owners == owners[n - 1:n - 1 + gram_count]
+    return codes[inside], gram_owners[inside]
+
+
+def make_permutations(seed=0):
+    # multiply-shift hashing: (a * h + b) mod 2^64, top 32 bits; no modulo, so much cheaper than a prime field
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, np.iinfo(np.uint64).max, size=(minhash_permutations, 1), dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, size=(minhash_permutations, 1), dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(codes, owners, document_count, permutations):
+    # one row per document, rows of documents without shingles stay at the empty_signature sentinel
+    a, b = permutations
+    signatures = np.full((document_count, minhash_permutations), empty_signature, dtype=np.uint32)
+    # codes are sorted by owner; blocks of about shingles_per_block codes, cut at document boundaries
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else np.array([], dtype=np.int64)
+    block_start = 0
+    while block_start < len(starts):
+        block_end = max(np.searchsorted(starts, starts[block_start] + shingles_per_block), block_start + 1)
+        first = starts[block_start]
+        last = starts[block_end] if block_end < len(starts) else len(codes)
+        hashes = codes[first:last]
+        permuted = ((a * hashes[None, :] + b) >> np.uint64(32)).astype(np.uint32)
+        signatures[owners[starts[block_start:block_end]]] = np.minimum.reduceat(permuted, starts[block_start:block_end] - first, axis=1).T
+        block_start = block_end
+    return signatures
+
+
+def lsh_candidate_pairs(signatures, has_shingles, artist_codes):
+    # a bucket is (artist, band values): versions of a song share the artist, so other artists are never compared
+    rows_per_band = minhash_permutations // lsh_bands
+    documents = np.flatnonzero(has_shingles)
+    pairs = set()
+    for band in range(lsh_bands):
+        band_values = pd.DataFrame(signatures[documents, band * rows_per_band:(band + 1) * rows_per_band])
+        band_values["artist"] = artist_codes[documents]
+        keys = pd.util.hash_pandas_object(band_values, index=False).to_numpy()
+        for members in pd.Series(documents).groupby(keys).indices.values():
+            if len(members) > 1:
+                pairs.update(itertools.combinations(documents[members], 2))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.array(sorted(pairs), dtype=np.int64)
+
+
+def estimated_similarity(signatures, pairs, chunk_size=100000):
+    similarity = np.empty(len(pairs))
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        similarity[start:start + chunk_size] = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+    return similarity
+
+
+def find_version_clusters(data, title_column, artist_column, lyrics_column=None, timings=None):
+    timings = timings if timings is not None else {}
+    permutations = make_permutations()
+
+    start = time.perf_counter()
+    document_count = len(data)
+    title_codes, title_owners = shingle_codes([title_tokens(t) for t in data[title_column]], 3)
+    artists = data[artist_column] if artist_column in data.columns else pd.Series("", index=data.index)
+    artist_codes, _ = pd.factorize(artists.apply(normalize_text))
+    if lyrics_column is not None and lyrics_column in data.columns:
+        lyrics_codes, lyrics_owners = shingle_codes([lyrics_tokens(text) for text in data[lyrics_column]], lyrics_shingle_words)
+    else:
+        lyrics_codes, lyrics_owners = np.array([], dtype=np.uint64), np.array([], dtype=np.int64)
+    timings["shingles"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    title_signatures = minhash_signatures(title_codes, title_owners, document_count, permutations)
+    lyrics_signatures = minhash_signatures(lyrics_codes, lyrics_owners, document_count, permutations)
+    timings["minhash"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    has_title = np.bincount(title_owners, minlength=document_count) > 0
+    pairs = lsh_candidate_pairs(title_signatures, has_title, artist_codes)
+    timings["lsh"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    has_lyrics = np.bincount(lyrics_owners, minlength=document_count) > 0
+    duplicate = np.zeros(len(pairs), dtype=bool)
+    if len(pairs):
+        title_match = estimated_similarity(title_signatures, pairs) >= title_similarity_threshold
+        both_lyrics = has_lyrics[pairs[:, 0]] & has_lyrics[pairs[:, 1]]
+        lyrics_match = estimated_similarity(lyrics_signatures, pairs) >= lyrics_similarity_threshold
+        duplicate = title_match & (~both_lyrics | lyrics_match)
+    confirmed = pairs[duplicate]
+    graph = sparse.coo_matrix((np.ones(len(confirmed)), (confirmed[:, 0], confirmed[:, 1])), shape=(len(data), len(data)))
+    _, clusters = connected_components(graph, directed=False)
+    timings["clusters"] = time.perf_counter() - start
+    timings["candidate_pairs"] = len(pairs)
+    timings["duplicate_pairs"] = len(confirmed)
+    return clusters
+
+
+def canonical_rank(data, clusters, title_column, popularity_columns=None, date_column=None):
+    # 0 for the canonical row of each cluster, then 1, 2, ... in rule order
+    sort_frame = pd.DataFrame({
+        "cluster": clusters,
+        "version_words": [len(matched_version_words(title, canonical_penalty_words)) for title in data[title_column]],
+        "popularity": 0.0,
+        "release": pd.Timestamp.max,
+        "row": np.arange(len(data)),})
+    for column_name in popularity_columns or []:
+        if column_name in data.columns:
+            popularity = pd.to_numeric(data[column_name].astype(str).str.replace(",", "", regex=False), errors="coerce")
+            sort_frame["popularity"] = -popularity.fillna(0).to_numpy()
+            break
+    if date_column is not None and date_column in data.columns:
+        sort_frame["release"] = pd.to_datetime(data[date_column], errors="coerce").fillna(pd.Timestamp.max).to_numpy()
+
+    ordered = sort_frame.sort_values(["cluster", "version_words", "popularity", "release", "row"])
+    ranks = ordered.groupby("cluster").cumcount()
+    return ranks.sort_index().to_numpy()
+
+
+def add_version_columns(data, title_column, artist_column, lyrics_column=None, popularity_columns=None, date_column=None):
+    data = data.reset_index(drop=True)
+    clusters = find_version_clusters(data, title_column, artist_column, lyrics_column)
+    data["version_cluster"] = clusters
+    data["version_count"] = data.groupby("version_cluster")["version_cluster"].transform("size")
+    data["version_rank"] = canonical_rank(data, clusters, title_column, popularity_columns, date_column)
+    return data
+
+
+def add_kaggle_version_columns(kaggle_data):
+    return add_version_columns(kaggle_data, "track_name", "track_artist", "lyrics", ["track_popularity"], "track_album_release_date")
+
+
+def keep_canonical_versions(data, title_column, artist_column, lyrics_column=None, popularity_columns=None, date_column=None):
+    # one row per version cluster, other columns untouched
+    if data.empty:
+        return data
+    data = data.reset_index(drop=True)
+    clusters = find_version_clusters(data, title_column, artist_column, lyrics_column)
+    ranks = canonical_rank(data, clusters, title_column, popularity_columns, date_column)
+    return data[ranks == 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster versions of the same song in the Kaggle audio+lyrics table")
+    parser.add_argument("--kaggle",type=str,default=str(data_folder / kaggle_audio_subfolder / kaggle_cache_filename),help="Cached Kaggle table (.pkl) or CSV")
+    args = parser.parse_args()
+
+    kaggle_path = Path(args.kaggle)
+    if not kaggle_path.exists():
+        print("Error: Kaggle table not found:", kaggle_path)
+        return
+    kaggle_data = pd.read_pickle(kaggle_path) if kaggle_path.suffix == ".pkl" else pd.read_csv(kaggle_path)
+
+    timings = {}
+    start = time.perf_counter()
+    clusters = find_version_clusters(kaggle_data, "track_name", "track_artist", "lyrics", timings)
+    total = time.perf_counter() - start
+
+    sizes = np.bincount(clusters)
+    print("Rows:", len(kaggle_data))
+    print("Clusters:", len(sizes), "| with more than one version:", int((sizes > 1).sum()), "| rows in those:", int(sizes[sizes > 1].sum()), "| largest:", int(sizes.max()))
+    print("Candidate pairs:", timings["candidate_pairs"], "| confirmed duplicates:", timings["duplicate_pairs"])
+    print(f"shingles {timings['shingles']:.2f}s | minhash {timings['minhash']:.2f}s | lsh {timings['lsh']:.2f}s | clusters {timings['clusters']:.2f}s | total {total:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# src/plot_render.py
+# lean rendering path for the small bar charts
+# keeps one styled Figure/Axes per chart shape and only swaps the data, never touches pyplot's global state
+# usage (benchmark against plt.subplots per chart): python -m src.plot_render
+
+import time
+import math
+import tempfile
+from pathlib import Path
+from matplotlib.figure import Figure
+from matplotlib.artist import setp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from src.config import spotify_green, text_color, bg_color, plot_dpi, plot_png_compress_level
+
+bar_templates = {}
+
+
+def get_bar_template(figsize, template_key):
+    key = (figsize, template_key)
+    if key not in bar_templates:
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        fig.patch.set_facecolor(bg_color)
+        ax.set_facecolor(bg_color)
+        ax.title.set_color(text_color)
+        ax.xaxis.label.set_color(text_color)
+        ax.yaxis.label.set_color(text_color)
+        bar_templates[key] = {"fig": fig, "ax": ax, "bars": None, "labels": None, "layout": None, "errors": None}
+    return bar_templates[key]
+
+
+def layout_signature(ax, labels):
+    bottom, top = ax.get_ylim()
+    largest = max(abs(bottom), abs(top), 1e-12)
+    return (tuple(labels), math.floor(math.log10(largest)), bottom < 0)
+
+
+def render_bar(output_path, labels, values, title, xlabel=None, ylabel=None, figsize=(7, 5), tick_rotation=None, tick_ha="center", ylim_bottom=None, template_key="bar", errors=None):
+    template = get_bar_template(figsize, template_key)
+    fig = template["fig"]
+    ax = template["ax"]
+    labels = [str(label) for label in labels]
+
+    if template["labels"] == labels:
+        for bar, value in zip(template["bars"], values):
+            bar.set_height(value)
+    else:
+        # new categories: swap the bars, keep the styled axes
+        if template["bars"] is not None:
+            template["bars"].remove()
+        # numeric positions, so old categories do not linger on the axis
+        positions = list(range(len(labels)))
+        template["bars"] = ax.bar(positions, values, color=spotify_green)
+        ax.set_xticks(positions, labels)
+        template["labels"] = labels
+        if tick_rotation is not None:
+            setp(ax.get_xticklabels(), rotation=tick_rotation, ha=tick_ha)
+
+    # error bars are redrawn every time (2 x n array of distances below/above each bar)
+    if template["errors"] is not None:
+        template["errors"].remove()
+        template["errors"] = None
+    if errors is not None:
+        template["errors"] = ax.errorbar(range(len(labels)), values, yerr=errors, fmt="none", ecolor=text_color, capsize=3, linewidth=1)
+
+    ax.set_autoscale_on(True)
+    ax.relim()
+    ax.autoscale_view()
+    if ylim_bottom is not None:
+        ax.set_ylim(bottom=ylim_bottom)
+
+    ax.set_title(title)
+    ax.set_xlabel(xlabel or "")
+    ax.set_ylabel(ylabel or "")
+
+    # margins only move when the tick labels do: new categories or a different y magnitude/sign
+    layout = layout_signature(ax, labels)
+    if layout != template["layout"]:
+        fig.tight_layout()
+        template["layout"] = layout
+    fig.savefig(output_path, dpi=plot_dpi, pil_kwargs={"compress_level": plot_png_compress_level})
+
+
+def benchmark_bar_rendering(results_dir, chart_count=20):
+    import matplotlib.pyplot as plt
+
+    labels = ["Top 10%", "Bottom 10%"]
+
+    # warm up font caches so neither path pays for them
+    render_bar(results_dir / "warmup.png", labels, [1, 2], "warmup", figsize=(5, 4), template_key="bench")
+
+    start = time.perf_counter()
+    for i in range(chart_count):
+        fig, ax = plt.subplots(figsize=(5, 4))
+        ax.bar(labels, [i + 1, 2], color=spotify_green)
+        ax.set_ylabel("Average feature")
+        ax.set_title(f"Feature {i}: Top vs Bottom (by Streams)")
+        fig.patch.set_facecolor(bg_color)
+        ax.set_facecolor(bg_color)
+        plt.tight_layout()
+        plt.savefig(results_dir / f"pyplot_{i}.png")
+        plt.close(fig)
+    pyplot_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(chart_count):
+        render_bar(results_dir / f"template_{i}.png", labels, [i + 1, 2], f"Feature {i}: Top vs Bottom (by Streams)", ylabel="Average feature", figsize=(5, 4), template_key="bench")
+    template_time = time.perf_counter() - start
+
+    print(f"{chart_count} charts, pyplot per figure: {pyplot_time:.2f}s")
+    print(f"{chart_count} charts, reused template: {template_time:.2f}s ({pyplot_time / template_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as temp_folder:
+        benchmark_bar_rendering(Path(temp_folder))
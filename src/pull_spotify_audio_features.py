@@ -0,0 +1,101 @@
+# src/pull_spotify_audio_features.py
+# optional stage: fetch audio features straight from Spotify for every sp_track_id we collected
+# 100 ids per request, through the same retry policy and pacing as the other Spotify calls
+# reads data/spotify_from_kworb_400.csv, saves data/spotify_audio_features.csv (sp_track_id + audio_feature_columns)
+# the Kaggle merge uses these for songs the Kaggle table does not have
+# responses are kept in the response archive; --from-archive rebuilds the CSV from them without the network
+
+import time
+import argparse
+from pathlib import Path
+import pandas as pd
+from src.config import (data_folder,spotify_from_kworb_filename,spotify_audio_features_filename,spotify_audio_features_url,audio_features_batch_size,audio_feature_columns,sleep_between_calls)
+from src.pull_spotify_kworb400 import get_access_token, retry_policy
+from src.retry_policy import get_with_retry, SpotifyRequestError
+from src.response_archive import archive_response, load_payloads
+
+audio_features_url = spotify_audio_features_url
+
+
+def get_audio_features_batch(track_ids, access_token):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    params = {"ids": ",".join(track_ids)}
+    response = get_with_retry(retry_policy, audio_features_url, headers=headers, params=params)
+    archive_response("spotify_audio_features", params["ids"], response.content)
+    # unknown ids come back as null entries
+    return [features for features in response.json().get("audio_features", []) if features]
+
+
+def features_row(features):
+    row = {"sp_track_id": features.get("id")}
+    for column_name in audio_feature_columns:
+        row[column_name] = features.get(column_name)
+    return row
+
+
+def rows_from_response(features_response):
+    return [features_row(features) for features in features_response.get("audio_features", []) if features]
+
+
+def fetch_audio_features(track_ids, access_token, batch_size=audio_features_batch_size):
+    rows = []
+    failed_ids = []
+    for start in range(0, len(track_ids), batch_size):
+        batch = track_ids[start:start + batch_size]
+        try:
+            for features in get_audio_features_batch(batch, access_token):
+                rows.append(features_row(features))
+        except SpotifyRequestError as error:
+            print("Failed batch starting at", start, "|", error)
+            failed_ids.extend(batch)
+        time.sleep(sleep_between_calls)
+    return pd.DataFrame(rows, columns=["sp_track_id"] + audio_feature_columns), failed_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch Spotify audio features for collected track ids")
+    parser.add_argument("--spotify",type=str,default=str(data_folder / spotify_from_kworb_filename),help="Spotify+Kworb CSV with sp_track_id")
+    parser.add_argument("--out",type=str,default=str(data_folder / spotify_audio_features_filename),help="Output CSV path")
+    parser.add_argument("--from-archive",action="store_true",help="Rebuild the output from archived responses only (no network)")
+    args = parser.parse_args()
+
+    spotify_path = Path(args.spotify)
+    out_path = Path(args.out)
+    if not spotify_path.exists():
+        print("ERROR:", spotify_path, "not found")
+        return
+    spotify_data = pd.read_csv(spotify_path)
+    if "sp_track_id" not in spotify_data.columns:
+        print("ERROR: Spotify file is missing column: sp_track_id")
+        return
+
+    track_ids = spotify_data["sp_track_id"].dropna().astype(str).drop_duplicates().tolist()
+
+    if args.from_archive:
+        batches = load_payloads("spotify_audio_features", transform=rows_from_response)
+        archived = pd.DataFrame([row for rows in batches.values() for row in rows], columns=["sp_track_id"] + audio_feature_columns)
+        archived = archived[archived["sp_track_id"].isin(track_ids)].drop_duplicates(subset=["sp_track_id"], keep="last")
+        archived.to_csv(out_path, index=False)
+        print("Rebuilt", len(archived), "of", len(track_ids), "tracks from the archive →", out_path)
+        return
+
+    # only ask for ids we do not have yet
+    existing = pd.DataFrame(columns=["sp_track_id"] + audio_feature_columns)
+    if out_path.exists():
+        existing = pd.read_csv(out_path)
+        known_ids = set(existing["sp_track_id"].astype(str))
+        track_ids = [track_id for track_id in track_ids if track_id not in known_ids]
+
+    print("Fetching audio features for", len(track_ids), "tracks in batches of", audio_features_batch_size)
+    access_token = get_access_token()
+    features, failed_ids = fetch_audio_features(track_ids, access_token)
+
+    all_features = pd.concat([existing, features], ignore_index=True).drop_duplicates(subset=["sp_track_id"], keep="last")
+    all_features.to_csv(out_path, index=False)
+    if failed_ids:
+        print("Failed ids:", len(failed_ids), "(rerun to retry)")
+    print("Saved", len(all_features), "rows →", out_path)
+
+
+if __name__ == "__main__":
+    main()
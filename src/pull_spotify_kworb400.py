@@ -2,21 +2,36 @@
 # reads data/kworb_top_400.csv (columns: Artist, Title)
 # gets a Spotify access token using client credentials from .env
 # searches each song on Spotify and saves basic track metadata
-# fetches artist followers/popularity/genres per song
-# saves to data/spotify_from_kworb_400.csv
-
+# fetches artist followers/popularity/genres once per artist
+# songs already in data/track_index.csv (with their artist stats) are resolved locally without any API call
+# work goes through a lease-based SQLite queue so several workers/hosts can share it
+# saves to data/spotify_from_kworb_400.csv in kworb order
+# every search/artist response is kept in the response archive; --from-archive rebuilds the CSV from the track index
+# and the archive, in the same resolution order as the online run, without the network
+
+import os
 import time
 import base64
+import socket
+import multiprocessing
 import requests
 import pandas as pd
 import argparse
 from pathlib import Path
-from src.config import (data_folder,kworb_output_filename,spotify_from_kworb_filename,sleep_between_calls,checkpoint_every,get_artist_stats,spotify_token_url,spotify_search_url,spotify_artists_url,spotify_client_id,spotify_client_secret,)
+from src.config import (data_folder,kworb_output_filename,spotify_from_kworb_filename,track_index_filename,search_candidates,dead_letter_filename,enrichment_queue_filename,lease_batch_size,lease_seconds_default,sleep_between_calls,get_artist_stats,spotify_token_url,spotify_search_url,spotify_artists_url,spotify_client_id,spotify_client_secret,)
+from src.retry_policy import make_policy, share_pause, get_with_retry, SpotifyRequestError
+from src.genre_index import build_genre_index, save_genre_index
+from src.work_queue import enqueue_kworb_rows, lease_batch, complete_song, fail_song, append_dead_letter, retry_failed, queue_counts, assemble_results, none_if_missing, breaker_paused_until, extend_breaker_pause
+from src.track_index import artist_columns, load_track_index, lookup_track, add_track, save_track_index, index_results, pick_best_candidate
+from src.response_archive import archive_response, request_key, load_payloads
 
 data_folder.mkdir(parents=True, exist_ok=True)
 
 default_kworb_file = data_folder / kworb_output_filename
 default_out_file = data_folder / spotify_from_kworb_filename
+default_index_file = data_folder / track_index_filename
+default_dead_letter_file = data_folder / dead_letter_filename
+default_queue_file = data_folder / enrichment_queue_filename
 
 token_url = spotify_token_url
 search_url = spotify_search_url
@@ -25,6 +40,8 @@ artists_url = spotify_artists_url
 client_id = spotify_client_id
 client_secret = spotify_client_secret
 
+retry_policy = make_policy()
+
 def get_access_token():
     if not client_id or not client_secret:
         raise RuntimeError("Set SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET in .env")
@@ -44,71 +61,237 @@ def normalize_text(value):
         return ""
 
 
-def search_track_first(query, access_token):
+def search_params(query, limit):
+    return {"q": query, "type": "track", "limit": limit}
+
+
+def search_tracks(query, access_token, limit=1):
     headers = {"Authorization": f"Bearer {access_token}"}
-    params = {"q": query, "type": "track", "limit": 1}
+    params = search_params(query, limit)
 
-    for attempt in range(3):
-        response = requests.get(search_url,headers=headers,params=params,timeout=30,)
+    response = get_with_retry(retry_policy, search_url, headers=headers, params=params)
+    archive_response("spotify_search", request_key(params), response.content)
+    data = response.json()
+    return data.get("tracks", {}).get("items", [])
 
-        if response.status_code == 429:
-            wait_seconds = int(response.headers.get("Retry-After", "1"))
-            time.sleep(wait_seconds + 0.5)
-            continue
 
-        if 200 <= response.status_code < 300:
-            data = response.json()
-            items = data.get("tracks", {}).get("items", [])
-            if items:
-                return items[0]
-            else:
-                return None
+def search_track_best(kworb_title, kworb_artist, access_token):
+    # asks for several candidates and keeps the one closest to the kworb title/artist
+    items = search_tracks(f"{kworb_title} {kworb_artist}", access_token, limit=search_candidates)
+    return pick_best_candidate(items, kworb_title, kworb_artist)
 
-        time.sleep(0.6 * (attempt + 1))
 
-    response.raise_for_status()
+def track_fields(track_data):
+    primary_artist = track_data["artists"][0]
+    return {
+        "_jn_name": normalize_text(track_data.get("name")),
+        "_jn_artist": normalize_text(primary_artist.get("name")),
+        "sp_track_id": track_data.get("id"),
+        "isrc": (track_data.get("external_ids") or {}).get("isrc"),
+        "name": track_data.get("name"),
+        "artist_names": ", ".join(a.get("name", "") for a in track_data.get("artists", [])),
+        "album_name": track_data.get("album", {}).get("name"),
+        "release_date": track_data.get("album", {}).get("release_date"),
+        "explicit": track_data.get("explicit"),
+        "duration_ms": track_data.get("duration_ms"),
+        "popularity": track_data.get("popularity"),
+        "primary_artist_id": primary_artist.get("id"),}
 
 
 def get_artist(artist_id, access_token):
     headers = {"Authorization": f"Bearer {access_token}"}
     url = f"{artists_url}/{artist_id}"
 
-    for attempt in range(3):
-        response = requests.get(url,headers=headers,timeout=30,)
-
-        if response.status_code == 429:
-            wait_seconds = int(response.headers.get("Retry-After", "1"))
-            time.sleep(wait_seconds + 0.5)
-            continue
-
-        if 200 <= response.status_code < 300:
-            return response.json()
-
-        time.sleep(0.6 * (attempt + 1))
+    response = get_with_retry(retry_policy, url, headers=headers)
+    archive_response("spotify_artist", artist_id, response.content)
+    return response.json()
+
+
+def resolve_kworb_row(kworb_row, track_index, search, fetch_artist):
+    # one resolution order for the online run and the archive rebuild: the track index, then a search
+    # (add_track maps a new match onto an already indexed ISRC), then the artist stats
+    # search(title, artist) → track fields or None, fetch_artist(artist_id) → artist response or None
+    kworb_title = str(kworb_row["Title"])
+    kworb_artist = str(kworb_row["Artist"])
+
+    fields = lookup_track(track_index, kworb_title, kworb_artist)
+    if fields is None:
+        track = search(kworb_title, kworb_artist)
+        if not track:
+            return None
+        fields = add_track(track_index, kworb_title, kworb_artist, track)
+
+    artist = None
+    primary_artist_id = fields.get("primary_artist_id")
+    if get_artist_stats and pd.notna(primary_artist_id) and primary_artist_id:
+        if has_artist_fields(fields):
+            artist = {column: fields.get(column) for column in artist_columns}
+        else:
+            artist_data = fetch_artist(primary_artist_id)
+            if artist_data is not None:
+                # the index keeps the answer, so later runs need no artist call
+                artist = artist_fields(artist_data)
+                fields.update(artist)
+
+    return build_record(kworb_row, fields, artist)
+
+
+def enrich_kworb_row(kworb_row, access_token, track_index, artist_cache, run_stats):
+    # returns the output record for one kworb row, or None when spotify has no match
+    run_stats["used_network"] = False
+    search_calls = run_stats["search_calls"]
+
+    def search(kworb_title, kworb_artist):
+        run_stats["search_calls"] += 1
+        run_stats["used_network"] = True
+        track_data = search_track_best(kworb_title, kworb_artist, access_token)
+        return track_fields(track_data) if track_data else None
+
+    def fetch_artist(artist_id):
+        # many songs share an artist, only ask once per run
+        if artist_id not in artist_cache:
+            artist_cache[artist_id] = get_artist(artist_id, access_token) or {}
+            run_stats["used_network"] = True
+        return artist_cache[artist_id]
+
+    record = resolve_kworb_row(kworb_row, track_index, search, fetch_artist)
+    if run_stats["search_calls"] == search_calls:
+        run_stats["index_hits"] += 1
+    return record
+
+
+def artist_fields(artist_data):
+    followers_info = artist_data.get("followers") or {}
+    genres = artist_data.get("genres", []) or []
+    return {"artist_followers": followers_info.get("total"), "artist_popularity": artist_data.get("popularity"), "artist_genres": ", ".join(genres)}
+
+
+def has_artist_fields(fields):
+    return pd.notna(fields.get("artist_popularity"))
+
+
+def build_record(kworb_row, fields, artist=None):
+    record = {column: value for column, value in fields.items() if column not in ("kworb_key", "name_key", "primary_artist_id") and column not in artist_columns}
+    record.update({
+        "kworb_title": str(kworb_row["Title"]),
+        "kworb_artist": str(kworb_row["Artist"]),
+        "kworb_streams": kworb_row.get("Streams"),
+        "kworb_daily_streams": kworb_row.get("Daily [streams]"),})
+
+    if artist is not None:
+        record["primary_artist_id"] = fields.get("primary_artist_id")
+        record.update(artist)
+
+    return record
+
+
+def search_candidates_from_response(search_response):
+    # runs in the archive reader processes: keep what scoring needs plus the output fields
+    return [
+        {"name": item.get("name"), "artists": [{"name": a.get("name")} for a in item.get("artists", [])], "popularity": item.get("popularity"), "fields": track_fields(item)}
+        for item in search_response.get("tracks", {}).get("items", []) if item and item.get("artists")]
+
+
+def rebuild_from_archive(kworb_df, out_path, index_path):
+    # replays the online resolution against archived responses; the track index is read but not written
+    start = time.perf_counter()
+    searches = load_payloads("spotify_search", transform=search_candidates_from_response)
+    artists = load_payloads("spotify_artist") if get_artist_stats else {}
+    track_index = load_track_index(index_path)
+    print("Loaded", len(searches), "archived searches and", len(artists), "archived artists in", f"{time.perf_counter() - start:.2f}s")
+
+    missing = []
+
+    def search(kworb_title, kworb_artist):
+        candidates = searches.get(request_key(search_params(f"{kworb_title} {kworb_artist}", search_candidates)))
+        if candidates is None:
+            missing.append(kworb_title)
+            return None
+        best = pick_best_candidate(candidates, kworb_title, kworb_artist)
+        return best["fields"] if best is not None else None
+
+    records = []
+    for kworb_row in kworb_df.to_dict("records"):
+        # stream counts as the queue stores them, so both paths write the same CSV
+        kworb_row["Streams"] = none_if_missing(kworb_row.get("Streams"))
+        kworb_row["Daily [streams]"] = none_if_missing(kworb_row.get("Daily [streams]"))
+        record = resolve_kworb_row(kworb_row, track_index, search, artists.get)
+        if record is not None:
+            records.append(record)
+
+    output_df = pd.DataFrame(records)
+    output_df.to_csv(out_path, index=False)
+    incidence, vocabulary = build_genre_index(output_df)
+    save_genre_index(incidence, vocabulary, out_path, output_df)
+    print("Rebuilt", len(output_df), "rows from the archive →", out_path, "| not in index or archive:", len(missing), f"| {time.perf_counter() - start:.2f}s")
+
+
+def run_worker(queue_path, index_path, dead_letter_path, worker_id, batch_size=lease_batch_size, lease_seconds=lease_seconds_default):
+    # leases batches until the queue has no pending rows left
+    access_token = None
+    track_index = load_track_index(index_path)
+    run_stats = {"index_hits": 0, "search_calls": 0, "used_network": False}
+    artist_cache = {}
+    processed = 0
+    # a breaker trip in any worker pauses all of them
+    share_pause(retry_policy, lambda: breaker_paused_until(queue_path), lambda paused_until: extend_breaker_pause(queue_path, paused_until))
+
+    while True:
+        batch = lease_batch(queue_path, worker_id, batch_size, lease_seconds)
+        if not batch:
+            break
+        if access_token is None:
+            access_token = get_access_token()
+
+        for kworb_row in batch:
+            try:
+                record = enrich_kworb_row(kworb_row, access_token, track_index, artist_cache, run_stats)
+            except SpotifyRequestError as error:
+                print(f"[{worker_id}] Failed:", kworb_row["Title"], "-", kworb_row["Artist"], "|", error)
+                fail_song(queue_path, worker_id, kworb_row["song_key"], error)
+                append_dead_letter(dead_letter_path, kworb_row, error)
+                continue
+
+            complete_song(queue_path, worker_id, kworb_row["song_key"], record)
+            processed += 1
+
+            if run_stats["used_network"]:
+                time.sleep(sleep_between_calls)
+
+        save_track_index(track_index, index_path)
+        print(f"[{worker_id}] processed {processed} rows")
+
+    print(f"[{worker_id}] Track index hits:", run_stats["index_hits"], "| search calls:", run_stats["search_calls"])
+    print(f"[{worker_id}] Retries used:", retry_policy["retries_used"], "| breaker trips:", retry_policy["breaker_trips"])
+    return processed
+
+
+def run_local_workers(queue_path, index_path, dead_letter_path, worker_count, batch_size, lease_seconds):
+    base_id = f"{socket.gethostname()}-{os.getpid()}"
+    if worker_count <= 1:
+        run_worker(queue_path, index_path, dead_letter_path, base_id, batch_size, lease_seconds)
+        return
 
-    response.raise_for_status()
+    workers = []
+    for worker_number in range(worker_count):
+        worker = multiprocessing.Process(target=run_worker, args=(queue_path, index_path, dead_letter_path, f"{base_id}-{worker_number}", batch_size, lease_seconds))
+        worker.start()
+        workers.append(worker)
+    for worker in workers:
+        worker.join()
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Pull Spotify metadata for Kworb songs")
-    parser.add_argument("--kworb",type=str,default=str(default_kworb_file),help="Path to input Kworb CSV (default: data/kworb_top_400.csv)",)
-    parser.add_argument("--out",type=str,default=str(default_out_file),help="Output CSV path (default: data/spotify_from_kworb_400.csv)",)
-    parser.add_argument("--limit",type=int,default=1000,help="Number of rows to process (default: 1000)",)
-    args = parser.parse_args()
-    kworb_path = Path(args.kworb)
-    out_path = Path(args.out)
-    row_limit = args.limit
-
+def load_kworb_rows(kworb_path, row_limit):
     if not kworb_path.exists():
         print("ERROR:", kworb_path, "not found")
-        return
+        return None
 
     kworb_df = pd.read_csv(kworb_path)
 
     for column_name in ["Artist", "Title"]:
         if column_name not in kworb_df.columns:
             print("ERROR: Missing column",repr(column_name),"in",kworb_path.name,)
-            return
+            return None
 
     kworb_df["__order"] = range(len(kworb_df))
 
@@ -117,77 +300,59 @@ def main():
         .drop_duplicates(subset=["Artist", "Title"], keep="first")
         .sort_values("__order")
         .head(row_limit))
+    return kworb_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pull Spotify metadata for Kworb songs")
+    parser.add_argument("--kworb",type=str,default=str(default_kworb_file),help="Path to input Kworb CSV (default: data/kworb_top_400.csv)",)
+    parser.add_argument("--out",type=str,default=str(default_out_file),help="Output CSV path (default: data/spotify_from_kworb_400.csv)",)
+    parser.add_argument("--limit",type=int,default=1000,help="Number of rows to process (default: 1000)",)
+    parser.add_argument("--dead-letter",type=str,default=str(default_dead_letter_file),help="CSV for songs that failed after retries (default: data/spotify_dead_letter.csv)",)
+    parser.add_argument("--index",type=str,default=str(default_index_file),help="Track index CSV path (default: data/track_index.csv)",)
+    parser.add_argument("--queue",type=str,default=str(default_queue_file),help="Shared work queue (default: data/enrichment_queue.sqlite)",)
+    parser.add_argument("--mode",choices=["all", "enqueue", "work", "assemble"],default="all",help="Run every step, or only enqueue / work / assemble (for workers on other hosts)",)
+    parser.add_argument("--workers",type=int,default=1,help="Local worker processes (default: 1)",)
+    parser.add_argument("--batch-size",type=int,default=lease_batch_size,help="Rows leased per batch",)
+    parser.add_argument("--lease-seconds",type=float,default=lease_seconds_default,help="Seconds before an unfinished lease is handed to another worker",)
+    parser.add_argument("--retry-failed",action="store_true",help="Put failed songs back in the queue",)
+    parser.add_argument("--include-no-match",action="store_true",help="With --retry-failed, also search again for songs Spotify had no match for",)
+    parser.add_argument("--from-archive",action="store_true",help="Rebuild the output from the track index and archived responses only (no network, no queue)",)
+    args = parser.parse_args()
+    queue_path = Path(args.queue)
+    out_path = Path(args.out)
+
+    if args.from_archive:
+        kworb_df = load_kworb_rows(Path(args.kworb), args.limit)
+        if kworb_df is not None:
+            rebuild_from_archive(kworb_df, out_path, Path(args.index))
+        return
 
-    print("Loaded", len(kworb_df), "Kworb rows to process")
-    access_token = get_access_token()
-    print("Token acquired")
-
-    all_rows = []
-    done_keys = set()
-
-    if out_path.exists():
-        existing_df = pd.read_csv(out_path)
-        all_rows = existing_df.to_dict("records")
-        for existing_row in all_rows:
-            key = (
-                normalize_text(existing_row.get("kworb_title")),
-                normalize_text(existing_row.get("kworb_artist")))
-            done_keys.add(key)
-        print("Resuming from", len(all_rows), "already saved rows...")
-
-    for i, kworb_row in kworb_df.iterrows():
-        kworb_title = str(kworb_row["Title"])
-        kworb_artist = str(kworb_row["Artist"])
-
-        key = (normalize_text(kworb_title), normalize_text(kworb_artist))
-        if key in done_keys:
-            continue
-
-        search_query = f"{kworb_title} {kworb_artist}"
-        track_data = search_track_first(search_query, access_token)
-
-        if not track_data:
-            time.sleep(sleep_between_calls)
-            continue
-
-        primary_artist = track_data["artists"][0]
-        primary_artist_id = primary_artist.get("id")
-
-        record = {
-            "_jn_name": normalize_text(track_data.get("name")),
-            "_jn_artist": normalize_text(primary_artist.get("name")),
-            "sp_track_id": track_data.get("id"),
-            "name": track_data.get("name"),
-            "artist_names": ", ".join(a.get("name", "") for a in track_data.get("artists", [])),
-            "album_name": track_data.get("album", {}).get("name"),
-            "release_date": track_data.get("album", {}).get("release_date"),
-            "explicit": track_data.get("explicit"),
-            "duration_ms": track_data.get("duration_ms"),
-            "popularity": track_data.get("popularity"),
-            "kworb_title": kworb_title,
-            "kworb_artist": kworb_artist,
-            "kworb_streams": kworb_row.get("Streams"),
-            "kworb_daily_streams": kworb_row.get("Daily [streams]"),}
-
-        if get_artist_stats and primary_artist_id:
-            artist_data = get_artist(primary_artist_id, access_token) or {}
-            record["primary_artist_id"] = primary_artist_id
-            followers_info = artist_data.get("followers") or {}
-            record["artist_followers"] = followers_info.get("total")
-            record["artist_popularity"] = artist_data.get("popularity")
-            genres = artist_data.get("genres", []) or []
-            record["artist_genres"] = ", ".join(genres)
-
-        all_rows.append(record)
-
-        if len(all_rows) % checkpoint_every == 0:
-            pd.DataFrame(all_rows).to_csv(out_path, index=False)
-            print("Checkpoint: saved", len(all_rows), "rows →", out_path)
-
-        time.sleep(sleep_between_calls)
-
-    pd.DataFrame(all_rows).to_csv(out_path, index=False)
-    print("Done. Saved", len(all_rows), "rows →", out_path)
+    if args.mode in ("all", "enqueue"):
+        kworb_df = load_kworb_rows(Path(args.kworb), args.limit)
+        if kworb_df is None:
+            return
+        print("Loaded", len(kworb_df), "Kworb rows to process")
+        enqueue_kworb_rows(queue_path, kworb_df)
+
+    if args.retry_failed:
+        print("Requeued", retry_failed(queue_path, args.include_no_match), "failed songs")
+
+    if args.mode in ("all", "work"):
+        print("Queue before work:", queue_counts(queue_path))
+        run_local_workers(queue_path, Path(args.index), Path(args.dead_letter), args.workers, args.batch_size, args.lease_seconds)
+
+    if args.mode in ("all", "assemble"):
+        assemble_results(queue_path, out_path, args.dead_letter)
+        output_df = pd.read_csv(out_path) if out_path.stat().st_size > 1 else pd.DataFrame()
+        incidence, vocabulary = build_genre_index(output_df)
+        save_genre_index(incidence, vocabulary, out_path, output_df)
+        track_index = load_track_index(args.index)
+        index_results(track_index, output_df)
+        save_track_index(track_index, args.index)
+
+    print("Queue:", queue_counts(queue_path))
+    print("Done.")
 
 
 if __name__ == "__main__":
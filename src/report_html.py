@@ -0,0 +1,265 @@
+# src/report_html.py
+# one self-contained HTML report instead of the folder of PNGs
+# the aggregates behind each chart are computed once and embedded as compact JSON,
+# the charts are drawn in the browser (plain SVG, no external scripts)
+# scatter data above report_max_points rows is binned into a report_scatter_bins x report_scatter_bins grid
+# usage: python -m src.report_html  → results/report.html
+
+import time
+import json
+import calendar
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.config import (data_folder,results_folder,spotify_kworb_kaggle1_kaggle2_filename,audio_feature_columns,spotify_green,text_color,bg_color,report_filename,report_max_points,report_scatter_bins)
+from src.analysis_spotify import load_data, pick_column, pick_streams_column, total_word_count, top_words
+
+
+def compact(values, digits=4):
+    # 4 significant digits is plenty for a chart and keeps the JSON small
+    return [None if pd.isna(v) else float(f"{v:.{digits}g}") for v in values]
+
+
+def bar_chart(title, labels, values, xlabel="", ylabel=""):
+    return {"type": "bar", "title": title, "labels": [str(label) for label in labels], "values": compact(values), "xlabel": xlabel, "ylabel": ylabel}
+
+
+def month_means(data, streams_column):
+    months = pd.to_datetime(data["release_date"], errors="coerce").dt.month
+    means = data[streams_column].groupby(months).mean().reindex(range(1, 13))
+    return bar_chart("Average Streams by Release Month", [calendar.month_abbr[m] for m in means.index], means.values, "Month", "Average Streams")
+
+
+def duration_bins(data, streams_column, duration_column):
+    # (k, k+1] minute bins, 0 included in the first one, like pd.cut in the PNG version
+    minutes = data[duration_column] / 60000.0
+    means = data[streams_column].groupby(np.maximum(np.ceil(minutes) - 1, 0)).mean().dropna()
+    labels = [f"{int(m)}-{int(m) + 1}" for m in means.index]
+    return bar_chart("Average Streams by Song Duration Range", labels, means.values, "Song Duration (minutes)", "Average Streams")
+
+
+def tempo_buckets(data):
+    # (start, start+5] buckets, lowest tempo included in the first one
+    # empty ranges stay in as zeros, like the pd.cut bins of the PNG version
+    tempo = data["tempo"].dropna()
+    first_start = int(5 * np.floor(tempo.min() / 5.0))
+    bucket_start = np.maximum(5 * np.ceil(tempo / 5.0) - 5, first_start).astype(int)
+    counts = bucket_start.value_counts().reindex(range(first_start, bucket_start.max() + 1, 5), fill_value=0)
+    labels = [f"{start}-{start + 5}" for start in counts.index]
+    return bar_chart("Distribution of Song Tempos", labels, counts.values, "Tempo (BPM, 5-BPM ranges)", "Number of Songs")
+
+
+def correlation_matrix(data, columns):
+    matrix = data[columns].corr(numeric_only=True)
+    return {"type": "heatmap", "title": "Correlation Heatmap: Audio Features & Streams", "labels": list(matrix.columns), "values": [compact(row, 3) for row in matrix.values]}
+
+
+def word_counts(data, streams_column, top_n=20):
+    most_common_list = top_words(data, streams_column, top_n)
+    words = [word for word, _ in most_common_list]
+    counts = [count for _, count in most_common_list]
+    return bar_chart("Most Common Words in High-Stream Songs", words, counts, "", "Count")
+
+
+def audio_profiles(data, streams_column, audio_columns):
+    cleaned_data = data.dropna(subset=audio_columns + [streams_column])
+    top_songs = cleaned_data[cleaned_data[streams_column] >= cleaned_data[streams_column].quantile(0.90)]
+    bottom_songs = cleaned_data[cleaned_data[streams_column] <= cleaned_data[streams_column].quantile(0.10)]
+    return {"type": "grouped", "title": "Audio Profiles: Top 10% vs Bottom 10% (by Streams)", "labels": audio_columns,
+            "series": {"Top 10%": compact(top_songs[audio_columns].mean()), "Bottom 10%": compact(bottom_songs[audio_columns].mean())}}
+
+
+def scatter(title, x, y, xlabel, ylabel, log_x=False, log_y=False):
+    pair = pd.DataFrame({"x": pd.to_numeric(x, errors="coerce"), "y": pd.to_numeric(y, errors="coerce")})
+    if log_x:
+        pair = pair[pair["x"] > 0]
+        pair["x"] = np.log10(pair["x"])
+    if log_y:
+        pair = pair[pair["y"] > 0]
+        pair["y"] = np.log10(pair["y"])
+    pair = pair.dropna()
+    chart = {"type": "scatter", "title": title, "xlabel": xlabel, "ylabel": ylabel, "log_x": log_x, "log_y": log_y, "rows": len(pair)}
+    if len(pair) <= report_max_points:
+        chart["x"] = compact(pair["x"])
+        chart["y"] = compact(pair["y"])
+        return chart
+    # too many points: counts on a grid, only the non-empty cells are kept
+    counts, x_edges, y_edges = np.histogram2d(pair["x"], pair["y"], bins=report_scatter_bins)
+    x_cells, y_cells = np.nonzero(counts)
+    chart["x_edges"] = compact(x_edges)
+    chart["y_edges"] = compact(y_edges)
+    chart["cells"] = np.column_stack([x_cells, y_cells, counts[x_cells, y_cells]]).astype(int).tolist()
+    return chart
+
+
+def explicit_share(data):
+    # same labels as the pie chart
+    labels = data["explicit"].map(lambda flag: "Unknown" if pd.isna(flag) else ("Explicit" if bool(flag) else "Non-Explicit"))
+    counts = labels.value_counts()
+    return bar_chart("Explicit vs Non-Explicit Songs", counts.index, counts.values, "", "Number of Songs")
+
+
+def build_report_data(data, youtube_data=None):
+    streams_column = pick_streams_column(data)
+    if streams_column is None:
+        print("streams column missing")
+        return []
+    charts = []
+    audio_columns = [c for c in audio_feature_columns if c in data.columns]
+    duration_column = pick_column(data, ["duration_ms_spotify", "duration_ms"])
+
+    if "release_date" in data.columns:
+        charts.append(month_means(data, streams_column))
+    if duration_column is not None:
+        charts.append(duration_bins(data, streams_column, duration_column))
+    if "tempo" in data.columns:
+        charts.append(tempo_buckets(data))
+    if audio_columns:
+        charts.append(correlation_matrix(data, audio_columns + [streams_column]))
+        charts.append(audio_profiles(data, streams_column, audio_columns))
+    if "lyrics" in data.columns:
+        charts.append(word_counts(data, streams_column))
+        charts.append(scatter("Total Lyrics Word Count vs Streams", data["lyrics"].apply(total_word_count), data[streams_column], "Total Words in Lyrics", "Streams", log_y=True))
+    if "explicit" in data.columns:
+        charts.append(explicit_share(data))
+    if youtube_data is not None and "Total Views" in youtube_data.columns and "kworb_streams" in youtube_data.columns:
+        views = youtube_data["Total Views"].astype(str).str.replace(",", "", regex=False)
+        charts.append(scatter("Spotify Streams vs YouTube Views", youtube_data["kworb_streams"], views, "Spotify Streams", "YouTube Views", log_x=True, log_y=True))
+    return charts
+
+
+page_template = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Spotify Kworb Top Songs: Analysis Report</title>
+<style>
+body { font-family: sans-serif; background: __BG__; color: __TEXT__; margin: 2em auto; max-width: 760px; }
+figure { margin: 0 0 2.5em 0; }
+figcaption { font-weight: bold; margin-bottom: .4em; }
+svg text { font-size: 11px; fill: __TEXT__; }
+</style></head><body>
+<h1>Spotify Kworb Top Songs: Analysis Report</h1>
+<p>__SUMMARY__</p>
+<div id="charts"></div>
+<script id="report-data" type="application/json">__DATA__</script>
+<script>
+const green = "__GREEN__", W = 720, H = 340, M = {l: 70, r: 20, t: 10, b: 80};
+const charts = JSON.parse(document.getElementById("report-data").textContent);
+const ns = "http://www.w3.org/2000/svg";
+function el(tag, attrs, parent, text) {
+  const node = document.createElementNS(ns, tag);
+  for (const k in attrs) node.setAttribute(k, attrs[k]);
+  if (text !== undefined) node.textContent = text;
+  if (parent) parent.appendChild(node);
+  return node;
+}
+function fmt(v) { return Math.abs(v) >= 1e4 ? v.toExponential(1) : +v.toFixed(3); }
+function axes(svg, c, y0, y1) {
+  const y = v => M.t + (H - M.t - M.b) * (1 - (v - y0) / ((y1 - y0) || 1));
+  el("line", {x1: M.l, x2: M.l, y1: M.t, y2: H - M.b, stroke: "__TEXT__"}, svg);
+  el("line", {x1: M.l, x2: W - M.r, y1: H - M.b, y2: H - M.b, stroke: "__TEXT__"}, svg);
+  for (let i = 0; i <= 4; i++) {
+    const v = y0 + (y1 - y0) * i / 4;
+    el("text", {x: M.l - 6, y: y(v) + 4, "text-anchor": "end"}, svg, c.log_y ? "1e" + v.toFixed(1) : fmt(v));
+  }
+  el("text", {x: 14, y: H / 2, transform: `rotate(-90 14 ${H / 2})`, "text-anchor": "middle"}, svg, c.ylabel || "");
+  el("text", {x: (W + M.l) / 2, y: H - 6, "text-anchor": "middle"}, svg, c.xlabel || "");
+  return y;
+}
+function bars(svg, c, series) {
+  const names = Object.keys(series), all = names.flatMap(n => series[n]).filter(v => v !== null);
+  const y0 = Math.min(0, ...all), y1 = Math.max(0, ...all), y = axes(svg, c, y0, y1);
+  const step = (W - M.l - M.r) / c.labels.length, width = step * 0.8 / names.length;
+  names.forEach((name, s) => series[name].forEach((v, i) => {
+    if (v === null) return;
+    const x = M.l + step * i + step * 0.1 + width * s;
+    el("rect", {x: x, width: width, y: Math.min(y(v), y(0)), height: Math.abs(y(v) - y(0)), fill: s ? "#888" : green}, svg);
+  }));
+  c.labels.forEach((label, i) => {
+    const x = M.l + step * (i + 0.5), ty = H - M.b + 12;
+    el("text", {x: x, y: ty, "text-anchor": c.labels.length > 12 ? "end" : "middle", transform: c.labels.length > 12 ? `rotate(-60 ${x} ${ty})` : ""}, svg, label);
+  });
+  if (names.length > 1) names.forEach((name, s) => el("text", {x: W - M.r - 90, y: M.t + 12 + 14 * s, fill: s ? "#888" : green}, svg, "■ " + name));
+}
+function shade(t) {
+  // white to green for positive correlations, white to blue for negative ones
+  const a = Math.abs(t), to = t > 0 ? [29, 185, 84] : [70, 110, 200];
+  return `rgb(${to.map(v => Math.round(255 - (255 - v) * a)).join(",")})`;
+}
+function heatmap(svg, c) {
+  const n = c.labels.length, size = Math.min((W - 130) / n, 40);
+  svg.setAttribute("height", size * n + 120);
+  c.values.forEach((row, i) => row.forEach((v, j) => {
+    el("rect", {x: 120 + j * size, y: i * size, width: size, height: size, fill: shade(v === null ? 0 : v)}, svg);
+    el("text", {x: 120 + (j + 0.5) * size, y: (i + 0.6) * size, "text-anchor": "middle"}, svg, v === null ? "" : v.toFixed(2));
+  }));
+  c.labels.forEach((label, i) => {
+    el("text", {x: 114, y: (i + 0.6) * size, "text-anchor": "end"}, svg, label);
+    const x = 120 + (i + 0.5) * size, ty = n * size + 12;
+    el("text", {x: x, y: ty, "text-anchor": "end", transform: `rotate(-60 ${x} ${ty})`}, svg, label);
+  });
+}
+function scatter(svg, c) {
+  const xs = c.x || c.x_edges, ys = c.y || c.y_edges;
+  const x0 = Math.min(...xs), x1 = Math.max(...xs), y0 = Math.min(...ys), y1 = Math.max(...ys);
+  const y = axes(svg, c, y0, y1), x = v => M.l + (W - M.l - M.r) * (v - x0) / ((x1 - x0) || 1);
+  for (let i = 0; i <= 4; i++) {
+    const v = x0 + (x1 - x0) * i / 4;
+    el("text", {x: x(v), y: H - M.b + 14, "text-anchor": "middle"}, svg, c.log_x ? "1e" + v.toFixed(1) : fmt(v));
+  }
+  if (c.cells) {
+    const most = Math.max(...c.cells.map(cell => cell[2]));
+    c.cells.forEach(([i, j, count]) => el("rect", {x: x(c.x_edges[i]), y: y(c.y_edges[j + 1]), width: x(c.x_edges[i + 1]) - x(c.x_edges[i]), height: y(c.y_edges[j]) - y(c.y_edges[j + 1]),
+      fill: green, "fill-opacity": 0.15 + 0.85 * Math.log(1 + count) / Math.log(1 + most)}, svg));
+  } else {
+    c.x.forEach((v, i) => el("circle", {cx: x(v), cy: y(c.y[i]), r: 2.5, fill: green, "fill-opacity": 0.5}, svg));
+  }
+}
+for (const c of charts) {
+  const figure = document.createElement("figure");
+  document.getElementById("charts").appendChild(figure);
+  const caption = document.createElement("figcaption");
+  caption.textContent = c.title + (c.cells ? ` (${c.rows} songs, binned)` : "");
+  figure.appendChild(caption);
+  const svg = el("svg", {width: W, height: H}, figure);
+  if (c.type === "bar") bars(svg, c, {value: c.values});
+  else if (c.type === "grouped") bars(svg, c, c.series);
+  else if (c.type === "heatmap") heatmap(svg, c);
+  else if (c.type === "scatter") scatter(svg, c);
+}
+</script></body></html>
+"""
+
+
+def write_report(charts, output_path, summary):
+    # "</" is escaped so lyrics words can never close the script tag
+    payload = json.dumps(charts, separators=(",", ":")).replace("</", "<\\/")
+    page = (page_template.replace("__DATA__", payload).replace("__SUMMARY__", summary)
+            .replace("__GREEN__", spotify_green).replace("__TEXT__", text_color).replace("__BG__", bg_color))
+    Path(output_path).write_text(page, encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the analysis as one self-contained HTML report")
+    parser.add_argument("--out",type=str,default=str(results_folder / report_filename),help="Output HTML path")
+    args, _ = parser.parse_known_args()
+
+    data, data_dir, results_dir = load_data()
+    if data is None:
+        return
+    youtube_path = data_folder / spotify_kworb_kaggle1_kaggle2_filename
+    youtube_data = pd.read_csv(youtube_path) if youtube_path.exists() else None
+
+    start = time.perf_counter()
+    charts = build_report_data(data, youtube_data)
+    aggregate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    write_report(charts, args.out, f"{len(data)} songs, {len(charts)} charts.")
+    write_time = time.perf_counter() - start
+
+    print("Saved report →", args.out, f"({Path(args.out).stat().st_size / 1024:.0f} KB)")
+    print(f"aggregation {aggregate_time:.2f}s | writing {write_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
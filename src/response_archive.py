@@ -0,0 +1,221 @@
+# src/response_archive.py
+# append-only archive of every raw response (Kworb HTML, Spotify JSON) in data/raw_archive
+# each response is one gzip member appended to a segment file; segments are per writer process and rotate at archive_segment_max_bytes
+# archive_index.sqlite maps (kind, request_key) → segment, byte offset, byte length
+# the stages rebuild their outputs from the newest response per request with --from-archive (no network),
+# reading segments in parallel worker processes; parsing JSON is the expensive part, so a transform
+# runs in the worker and only the fields a stage needs are sent back
+# usage (archive stats): python -m src.response_archive   benchmark: python -m src.response_archive --bench 10000
+
+import os
+import gzip
+import json
+import time
+import socket
+import sqlite3
+import tempfile
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from src.config import data_folder, raw_archive_folder, archive_raw_responses, archive_segment_max_bytes, archive_compress_level, archive_read_workers
+
+default_archive_dir = data_folder / raw_archive_folder
+index_filename = "archive_index.sqlite"
+records_per_read_chunk = 2000
+
+schema = """
+CREATE TABLE IF NOT EXISTS responses (
+    record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT,
+    request_key TEXT,
+    fetched_at REAL,
+    segment TEXT,
+    byte_offset INTEGER,
+    byte_length INTEGER,
+    raw_length INTEGER);
+CREATE INDEX IF NOT EXISTS idx_responses_request ON responses (kind, request_key, record_id);
+"""
+
+# one open segment per process (workers are separate processes, so they never share a file)
+archive_writer = {"pid": None, "archive_dir": None, "file": None, "segment": None, "size": 0, "sequence": 0, "lock": threading.Lock()}
+
+
+def archive_folder(archive_dir):
+    # resolved at call time, so the default folder can be pointed elsewhere (tests, one-off rebuilds)
+    return Path(archive_dir) if archive_dir is not None else default_archive_dir
+
+
+def connect(archive_dir):
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(archive_dir / index_filename), timeout=60, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(schema)
+    return connection
+
+
+def request_key(params):
+    # the same request always gives the same key, whatever order the params were built in
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+def open_segment(archive_dir):
+    if archive_writer["file"] is not None:
+        archive_writer["file"].close()
+    archive_writer["sequence"] += 1
+    segment = f"segment-{socket.gethostname()}-{os.getpid()}-{int(time.time())}-{archive_writer['sequence']}.gz"
+    archive_writer["file"] = open(Path(archive_dir) / segment, "ab")
+    archive_writer["segment"] = segment
+    archive_writer["size"] = archive_writer["file"].tell()
+
+
+def get_writer(archive_dir):
+    if archive_writer["pid"] != os.getpid() or archive_writer["archive_dir"] != str(archive_dir):
+        # first write in this process (or a forked child): never append to the parent's segment
+        archive_writer.update({"pid": os.getpid(), "archive_dir": str(archive_dir), "file": None, "connection": connect(archive_dir)})
+        open_segment(archive_dir)
+    return archive_writer
+
+
+def archive_response(kind, key, body, archive_dir=None):
+    if not archive_raw_responses:
+        return
+    archive_dir = archive_folder(archive_dir)
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    compressed = gzip.compress(body, compresslevel=archive_compress_level, mtime=0)
+    with archive_writer["lock"]:
+        writer = get_writer(archive_dir)
+        if writer["size"] > 0 and writer["size"] + len(compressed) > archive_segment_max_bytes:
+            open_segment(archive_dir)
+        offset = writer["size"]
+        writer["file"].write(compressed)
+        writer["file"].flush()
+        writer["size"] += len(compressed)
+        # the bytes are on disk before the index points at them
+        writer["connection"].execute(
+            "INSERT INTO responses (kind, request_key, fetched_at, segment, byte_offset, byte_length, raw_length) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, key, time.time(), writer["segment"], offset, len(compressed), len(body)))
+
+
+def latest_records(archive_dir, kind):
+    # newest response per request, in file order so each segment is read front to back
+    if not (Path(archive_dir) / index_filename).exists():
+        return pd.DataFrame(columns=["request_key", "segment", "byte_offset", "byte_length"])
+    connection = connect(archive_dir)
+    records = pd.read_sql_query("""
+        SELECT request_key, segment, byte_offset, byte_length FROM responses
+        WHERE record_id IN (SELECT MAX(record_id) FROM responses WHERE kind = ? GROUP BY request_key)
+        ORDER BY segment, byte_offset""", connection, params=(kind,))
+    connection.close()
+    return records
+
+
+def read_chunk(segment_path, keys, offsets, lengths, as_json, transform=None):
+    # one read for the whole byte range, then every gzip member is sliced out of memory
+    start = offsets[0]
+    with open(segment_path, "rb") as segment_file:
+        segment_file.seek(start)
+        block = segment_file.read(offsets[-1] + lengths[-1] - start)
+    payloads = {}
+    for key, offset, length in zip(keys, offsets, lengths):
+        body = gzip.decompress(block[offset - start:offset - start + length])
+        payload = json.loads(body) if as_json else body.decode("utf-8")
+        payloads[key] = transform(payload) if transform is not None else payload
+    return payloads
+
+
+def load_payloads(kind, archive_dir=None, workers=archive_read_workers, as_json=True, transform=None):
+    # {request_key: parsed response} for the newest response to every request of this kind
+    # transform must be a module-level function (it is sent to the worker processes)
+    archive_dir = archive_folder(archive_dir)
+    records = latest_records(archive_dir, kind)
+    workers = min(workers, os.cpu_count() or 1)
+    chunks = []
+    for segment, segment_records in records.groupby("segment", sort=False):
+        for start in range(0, len(segment_records), records_per_read_chunk):
+            chunk = segment_records.iloc[start:start + records_per_read_chunk]
+            chunks.append((str(Path(archive_dir) / segment), chunk["request_key"].tolist(), chunk["byte_offset"].tolist(), chunk["byte_length"].tolist(), as_json, transform))
+
+    payloads = {}
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            payloads.update(read_chunk(*chunk))
+        return payloads
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_payloads in executor.map(read_chunk, *zip(*chunks)):
+            payloads.update(chunk_payloads)
+    return payloads
+
+
+def latest_payload(kind, key, archive_dir=None, as_json=True):
+    archive_dir = archive_folder(archive_dir)
+    records = latest_records(archive_dir, kind)
+    records = records[records["request_key"] == key]
+    if records.empty:
+        return None
+    record = records.iloc[-1]
+    return read_chunk(Path(archive_dir) / record["segment"], [key], [int(record["byte_offset"])], [int(record["byte_length"])], as_json)[key]
+
+
+def archive_stats(archive_dir=None):
+    archive_dir = archive_folder(archive_dir)
+    if not (Path(archive_dir) / index_filename).exists():
+        return pd.DataFrame()
+    connection = connect(archive_dir)
+    stats = pd.read_sql_query("""
+        SELECT kind, COUNT(*) AS responses, COUNT(DISTINCT request_key) AS requests,
+               SUM(raw_length) / 1048576.0 AS raw_mb, SUM(byte_length) / 1048576.0 AS stored_mb
+        FROM responses GROUP BY kind ORDER BY kind""", connection)
+    connection.close()
+    return stats
+
+
+def benchmark_transform(payload):
+    # what the Spotify rebuild keeps from a search response
+    return [{"id": item.get("id"), "name": item.get("name"), "popularity": item.get("popularity"), "artists": item.get("artists")} for item in payload.get("tracks", {}).get("items", [])]
+
+
+def benchmark_archive(song_count):
+    # synthetic search + artist responses about the size of real ones
+    with tempfile.TemporaryDirectory() as archive_dir:
+        start = time.perf_counter()
+        for i in range(song_count):
+            items = [{"id": f"track{i}_{c}", "name": f"Song {i} version {c}", "popularity": c, "explicit": False, "duration_ms": 200000 + c,
+                      "artists": [{"id": f"artist{i % 2000}", "name": f"Artist {i % 2000}"}], "external_ids": {"isrc": f"US{i:09d}"},
+                      "album": {"name": f"Album {i}", "release_date": "2020-01-01", "images": [{"url": f"https://i.scdn.co/image/{i}{c}", "height": 640}] * 3},
+                      "available_markets": ["US", "GB", "FR", "DE", "ES", "IT", "NL", "SE"] * 10} for c in range(5)]
+            archive_response("spotify_search", request_key({"q": f"Song {i}", "type": "track", "limit": 5}), json.dumps({"tracks": {"items": items}}), archive_dir)
+            archive_response("spotify_artist", f"artist{i % 2000}", json.dumps({"id": f"artist{i % 2000}", "followers": {"total": i}, "popularity": 50, "genres": ["pop"]}), archive_dir)
+        write_time = time.perf_counter() - start
+        archive_writer["file"].close()
+        archive_writer["pid"] = None
+        print(archive_stats(archive_dir).to_string(index=False))
+        print(f"archived {song_count} songs: {write_time:.2f}s")
+        for workers in sorted({1, min(archive_read_workers, os.cpu_count() or 1)}):
+            start = time.perf_counter()
+            searches = load_payloads("spotify_search", archive_dir, workers, transform=benchmark_transform)
+            artists = load_payloads("spotify_artist", archive_dir, workers)
+            print(f"reloaded {len(searches)} searches + {len(artists)} artists with {workers} worker(s): {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show what the raw response archive holds")
+    parser.add_argument("--archive",type=str,default=str(default_archive_dir),help="Archive folder")
+    parser.add_argument("--bench",type=int,default=0,help="Time writing and reloading this many synthetic songs in a temporary archive")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark_archive(args.bench)
+        return
+    stats = archive_stats(args.archive)
+    if stats.empty:
+        print("No archive at", args.archive)
+        return
+    print(stats.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# src/retry_policy.py
+# shared retry rules for Spotify API calls
+# jittered exponential backoff, a retry budget per run, and a circuit breaker
+# the breaker pauses every caller sharing the policy after a streak of 429/5xx responses
+# policy state lives in one process; share_pause() hands the pause to other processes too (the queue workers
+# keep it in the queue database), while the retry budget stays per process
+
+import time
+import random
+import threading
+import requests
+from src.config import (max_retries,backoff_base_seconds,backoff_max_seconds,retry_budget_per_run,retryable_status_codes,breaker_failure_threshold,breaker_pause_seconds)
+
+
+class SpotifyRequestError(RuntimeError):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def make_policy(retry_budget=retry_budget_per_run):
+    return {
+        "retry_budget": retry_budget,
+        "retries_used": 0,
+        "consecutive_failures": 0,
+        "paused_until": 0.0,
+        "breaker_trips": 0,
+        "shared_pause": None,
+        "lock": threading.Lock(),}
+
+
+def share_pause(policy, read_paused_until, extend_paused_until):
+    # read_paused_until() → wall-clock time other processes paused until, extend_paused_until(t) pushes it later
+    policy["shared_pause"] = (read_paused_until, extend_paused_until)
+
+
+def is_retryable(status_code):
+    return status_code is None or status_code in retryable_status_codes
+
+
+def backoff_seconds(attempt):
+    ceiling = min(backoff_max_seconds, backoff_base_seconds * (2 ** attempt))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def wait_for_breaker(policy):
+    with policy["lock"]:
+        pause = policy["paused_until"] - time.monotonic()
+    if policy["shared_pause"] is not None:
+        pause = max(pause, policy["shared_pause"][0]() - time.time())
+    if pause > 0:
+        time.sleep(pause)
+
+
+def record_success(policy):
+    with policy["lock"]:
+        policy["consecutive_failures"] = 0
+
+
+def record_failure(policy, retry_after=None):
+    with policy["lock"]:
+        policy["consecutive_failures"] += 1
+        if policy["consecutive_failures"] >= breaker_failure_threshold:
+            pause = max(breaker_pause_seconds, retry_after or 0)
+            policy["consecutive_failures"] = 0
+            policy["breaker_trips"] += 1
+            print("Circuit breaker open: pausing Spotify calls for", pause, "s")
+        elif retry_after is not None:
+            # a 429 Retry-After applies to the whole app, not just this call
+            pause = retry_after
+        else:
+            return
+        policy["paused_until"] = max(policy["paused_until"], time.monotonic() + pause)
+    if policy["shared_pause"] is not None:
+        policy["shared_pause"][1](time.time() + pause)
+
+
+def take_retry(policy):
+    with policy["lock"]:
+        if policy["retries_used"] >= policy["retry_budget"]:
+            return False
+        policy["retries_used"] += 1
+        return True
+
+
+def get_with_retry(policy, url, headers=None, params=None, timeout=30):
+    last_error = None
+    for attempt in range(max_retries + 1):
+        wait_for_breaker(policy)
+
+        retry_after = None
+        try:
+            response = requests.get(url,headers=headers,params=params,timeout=timeout,)
+            status_code = response.status_code
+        except requests.RequestException as error:
+            response = None
+            status_code = None
+            last_error = error
+
+        if response is not None and 200 <= status_code < 300:
+            record_success(policy)
+            return response
+
+        if not is_retryable(status_code):
+            raise SpotifyRequestError(f"HTTP {status_code} for {url}", status_code)
+
+        if response is not None:
+            last_error = f"HTTP {status_code}"
+            if status_code == 429:
+                try:
+                    retry_after = float(response.headers.get("Retry-After", "1"))
+                except ValueError:
+                    retry_after = 1.0
+
+        record_failure(policy, retry_after)
+
+        if attempt == max_retries or not take_retry(policy):
+            break
+        # 429s wait on the shared pause set by record_failure instead
+        if retry_after is None:
+            time.sleep(backoff_seconds(attempt))
+
+    raise SpotifyRequestError(f"Giving up on {url}: {last_error}", status_code)
@@ -1,13 +1,17 @@
 # src/scrape_kworb_top400.py
 # scrape Kworb table
 # output: data/kworb_top_400.csv
+# also prints how many songs are new / changed / dropped since the previous scrape
+# the raw HTML goes to the response archive; --from-archive re-parses the newest archived page instead of fetching
 
+import io
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 from pathlib import Path
 import argparse
 from src.config import data_folder, kworb_url, kworb_user_agent, kworb_output_filename
+from src.response_archive import archive_response, latest_payload
 
 def clean_number(value):
     if pd.isna(value):
@@ -16,27 +20,34 @@ def clean_number(value):
     return pd.to_numeric(value_str, errors="coerce")
 
 
-def main():
+def kworb_delta(previous_df, current_df):
+    key_columns = ["Artist", "Title"]
+    previous_df = previous_df.drop_duplicates(subset=key_columns)
+    current_df = current_df.drop_duplicates(subset=key_columns)
+    compared = pd.merge(
+        current_df[key_columns + ["Streams", "Daily [streams]"]],
+        previous_df[key_columns + ["Streams"]].rename(columns={"Streams": "previous_streams"}),
+        on=key_columns,
+        how="outer",
+        indicator=True)
 
-    parser = argparse.ArgumentParser(description="Scrape Kworb top songs")
-    parser.add_argument("--out",type=str,default=str(data_folder / kworb_output_filename),help="Output CSV path (default: data/kworb_top_400.csv)")
-    parser.add_argument("--limit",type=int,default=1000,help="Number of rows to scrape (default: 1000)",)
-    args = parser.parse_args()
-    out_path = Path(args.out)
-    limit = args.limit
+    compared["change"] = "unchanged"
+    compared.loc[compared["_merge"] == "left_only", "change"] = "new"
+    compared.loc[compared["_merge"] == "right_only", "change"] = "dropped"
+    both = compared["_merge"] == "both"
+    compared.loc[both & (compared["Streams"] != compared["previous_streams"]), "change"] = "changed"
+    return compared.drop(columns=["_merge"])
 
-    headers = {"User-Agent": kworb_user_agent}
-    response = requests.get(kworb_url, headers=headers, timeout=30)
-    html = response.text
 
+def parse_kworb_table(html, limit):
     soup = BeautifulSoup(html, "html.parser")
     table = soup.select_one("table.addpos.sortable")
 
     if table is None:
         print("Error: could not find the Kworb table (class='addpos sortable').")
-        return
+        return None
 
-    df = pd.read_html(str(table))[0]
+    df = pd.read_html(io.StringIO(str(table)))[0]
 
     df.columns = [str(c).strip() for c in df.columns]
 
@@ -52,14 +63,14 @@ def main():
     if daily_col is None:
         print("Error: could not find a 'Daily' column in the Kworb table.")
         print("Columns found:", list(df.columns))
-        return
+        return None
 
     needed_columns = ["Artist and Title", "Streams", daily_col]
     for col in needed_columns:
         if col not in df.columns:
             print("Error: missing expected column:", col)
             print("Columns found:", list(df.columns))
-            return
+            return None
 
     df = df[needed_columns].head(limit).copy()
 
@@ -71,6 +82,38 @@ def main():
     df["Daily [streams]"] = df[daily_col].apply(clean_number)
 
     out_df = df[["Artist", "Title", "Streams", "Daily [streams]"]]
+    return out_df
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Scrape Kworb top songs")
+    parser.add_argument("--out",type=str,default=str(data_folder / kworb_output_filename),help="Output CSV path (default: data/kworb_top_400.csv)")
+    parser.add_argument("--limit",type=int,default=1000,help="Number of rows to scrape (default: 1000)",)
+    parser.add_argument("--from-archive",action="store_true",help="Re-parse the newest archived Kworb page instead of fetching it")
+    args = parser.parse_args()
+    out_path = Path(args.out)
+    limit = args.limit
+
+    if args.from_archive:
+        html = latest_payload("kworb_html", kworb_url, as_json=False)
+        if html is None:
+            print("Error: no archived Kworb page")
+            return
+    else:
+        headers = {"User-Agent": kworb_user_agent}
+        response = requests.get(kworb_url, headers=headers, timeout=30)
+        html = response.text
+        archive_response("kworb_html", kworb_url, html)
+
+    out_df = parse_kworb_table(html, limit)
+    if out_df is None:
+        return
+
+    if out_path.exists():
+        counts = kworb_delta(pd.read_csv(out_path), out_df)["change"].value_counts()
+        print("Delta vs previous scrape:", {change: int(counts.get(change, 0)) for change in ["new", "changed", "dropped", "unchanged"]})
+
     out_df.to_csv(out_path, index=False)
     print("Saved", len(out_df), "rows →", out_path)
 
@@ -0,0 +1,215 @@
+# src/similar_songs.py
+# "which songs sound most like this one" over the kaggle audio features
+# standardizes audio_feature_columns, builds a KD-tree (scipy) or falls back to blocked numpy brute force
+# the standardized features are saved next to the merged data so queries do not rebuild them,
+# together with a fingerprint of the feature matrix; a rebuilt matrix gets a fresh index
+# usage:
+#   python -m src.similar_songs build
+#   python -m src.similar_songs query --track-id 0VjIjW4GlUZAMYd2vXMi3b --k 10
+#   python -m src.similar_songs bench
+
+import time
+import hashlib
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.config import (data_folder,kaggle_matrix_filename,kaggle_matrix_index_filename,audio_matrix_index_filename,similarity_index_filename)
+from src.feature_matrix import load_feature_matrix, audio_block
+
+try:
+    from scipy.spatial import cKDTree
+except ModuleNotFoundError:
+    cKDTree = None
+
+query_block_size = 1024
+
+
+def matrix_fingerprint(matrix, index_data):
+    # neighbour rows are only valid for the exact matrix (and row order) they were built from
+    digest = hashlib.sha256(np.ascontiguousarray(audio_block(matrix)).tobytes())
+    if index_data is not None and "track_id" in index_data.columns:
+        digest.update("\n".join(index_data["track_id"].astype(str)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_similarity_index(matrix, index_data):
+    features = np.asarray(audio_block(matrix), dtype=np.float64)
+    keep = ~np.isnan(features).any(axis=1)
+    if index_data is not None and "track_id" in index_data.columns:
+        # the kaggle table lists the same track once per playlist
+        keep &= ~index_data["track_id"].duplicated().to_numpy()
+
+    features = features[keep]
+    mean = features.mean(axis=0)
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+    standardized = ((features - mean) / std).astype(np.float32)
+
+    rows = np.flatnonzero(keep)
+    return {"features": standardized, "mean": mean, "std": std, "rows": rows, "fingerprint": matrix_fingerprint(matrix, index_data), "tree": None}
+
+
+def save_similarity_index(similarity_index, index_path):
+    np.savez(index_path, features=similarity_index["features"], mean=similarity_index["mean"], std=similarity_index["std"], rows=similarity_index["rows"], fingerprint=similarity_index["fingerprint"])
+    print("Saved similarity index", similarity_index["features"].shape, "→", index_path)
+
+
+def load_similarity_index(index_path, matrix=None, index_data=None):
+    # None when the saved index was built from a different feature matrix (or predates fingerprints)
+    saved = np.load(index_path)
+    fingerprint = str(saved["fingerprint"]) if "fingerprint" in saved.files else None
+    if matrix is not None and fingerprint != matrix_fingerprint(matrix, index_data):
+        return None
+    return {"features": saved["features"], "mean": saved["mean"], "std": saved["std"], "rows": saved["rows"], "fingerprint": fingerprint, "tree": None}
+
+
+def get_tree(similarity_index):
+    if cKDTree is not None and similarity_index["tree"] is None:
+        similarity_index["tree"] = cKDTree(similarity_index["features"])
+    return similarity_index["tree"]
+
+
+def brute_force_neighbours(features, queries, k):
+    # squared distances for a block of queries at a time, keeps memory at block x n
+    feature_norms = (features.astype(np.float64) ** 2).sum(axis=1)
+    all_distances = np.empty((len(queries), k))
+    all_positions = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), query_block_size):
+        block = queries[start:start + query_block_size].astype(np.float64)
+        squared = (block ** 2).sum(axis=1)[:, None] + feature_norms[None, :] - 2.0 * block @ features.T
+        np.maximum(squared, 0, out=squared)
+        nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+        nearest_squared = np.take_along_axis(squared, nearest, axis=1)
+        order = np.argsort(nearest_squared, axis=1)
+        all_positions[start:start + len(block)] = np.take_along_axis(nearest, order, axis=1)
+        all_distances[start:start + len(block)] = np.sqrt(np.take_along_axis(nearest_squared, order, axis=1))
+    return all_distances, all_positions
+
+
+def nearest_neighbours(similarity_index, query_features, k=10):
+    # query_features: raw (unstandardized) audio features, one row per query
+    queries = (np.atleast_2d(query_features) - similarity_index["mean"]) / similarity_index["std"]
+    k = min(k, len(similarity_index["features"]))
+    tree = get_tree(similarity_index)
+    if tree is not None:
+        distances, positions = tree.query(queries, k=k)
+        distances = np.asarray(distances).reshape(len(queries), k)
+        positions = np.asarray(positions).reshape(len(queries), k)
+    else:
+        distances, positions = brute_force_neighbours(similarity_index["features"], queries, k)
+    # positions point into the index, rows point back into the feature matrix
+    return distances, similarity_index["rows"][positions]
+
+
+def similar_songs(similarity_index, matrix, index_data, track_ids, k=10):
+    rows = index_data.index[index_data["track_id"].isin(track_ids)].drop_duplicates()
+    found = index_data.loc[rows].drop_duplicates(subset=["track_id"])
+    query_features = np.asarray(audio_block(matrix)[found.index.to_numpy()], dtype=np.float64)
+    distances, neighbour_rows = nearest_neighbours(similarity_index, query_features, k + 1)
+
+    results = []
+    for query_number, query_row in enumerate(found.index):
+        rank = 0
+        for distance, neighbour_row in zip(distances[query_number], neighbour_rows[query_number]):
+            if index_data.at[neighbour_row, "track_id"] == found.at[query_row, "track_id"] or rank == k:
+                continue
+            rank += 1
+            results.append({
+                "query_track_id": found.at[query_row, "track_id"],
+                "rank": rank,
+                "track_id": index_data.at[neighbour_row, "track_id"],
+                "track_name": index_data.at[neighbour_row, "track_name"],
+                "track_artist": index_data.at[neighbour_row, "track_artist"],
+                "distance": round(float(distance), 4),})
+    return pd.DataFrame(results)
+
+
+def naive_neighbours(features, queries, k):
+    positions = []
+    for query in queries:
+        distances = np.sqrt(((features - query) ** 2).sum(axis=1))
+        positions.append(np.argsort(distances)[:k])
+    return np.array(positions)
+
+
+def benchmark(similarity_index, query_count=1000, k=10):
+    features = similarity_index["features"]
+    query_count = min(query_count, len(features))
+    queries = features[:query_count].astype(np.float64)
+    raw_queries = queries * similarity_index["std"] + similarity_index["mean"]
+
+    start = time.perf_counter()
+    naive_positions = naive_neighbours(features, queries, k)
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, brute_positions = brute_force_neighbours(features, queries, k)
+    brute_time = time.perf_counter() - start
+
+    print("Songs indexed:", len(features), "| queries:", query_count, "| k:", k)
+    print(f"naive per-query distances: {naive_time * 1000:.1f} ms")
+    print(f"blocked numpy brute force: {brute_time * 1000:.1f} ms")
+
+    if cKDTree is not None:
+        start = time.perf_counter()
+        similarity_index["tree"] = None
+        get_tree(similarity_index)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        nearest_neighbours(similarity_index, raw_queries, k)
+        tree_time = time.perf_counter() - start
+        print(f"kd-tree build: {build_time * 1000:.1f} ms, queries: {tree_time * 1000:.1f} ms")
+
+    agreement = np.mean(naive_positions[:, 0] == brute_positions[:, 0])
+    print(f"nearest neighbour agreement naive vs blocked: {agreement:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest-neighbour search over Kaggle audio features")
+    parser.add_argument("command",choices=["build", "query", "bench"],help="build the index, query it, or benchmark it")
+    parser.add_argument("--matrix",type=str,default=str(data_folder / kaggle_matrix_filename),help="Audio feature matrix (.npy)")
+    parser.add_argument("--matrix-index",type=str,default=str(data_folder / kaggle_matrix_index_filename),help="Row index CSV for the matrix")
+    parser.add_argument("--index",type=str,default=str(data_folder / similarity_index_filename),help="Saved similarity index (.npz)")
+    parser.add_argument("--track-id",type=str,nargs="*",default=None,help="Spotify track id(s) to query (default: every merged top song)")
+    parser.add_argument("--k",type=int,default=10,help="Number of neighbours per song (default: 10)")
+    parser.add_argument("--out",type=str,default=None,help="Optional CSV for query results")
+    args = parser.parse_args()
+
+    matrix_path = Path(args.matrix)
+    if not matrix_path.exists():
+        print("ERROR:", matrix_path, "not found (run the Kaggle merge first)")
+        return
+    matrix, index_data = load_feature_matrix(matrix_path, args.matrix_index)
+    index_path = Path(args.index)
+
+    similarity_index = None
+    if args.command != "build" and index_path.exists():
+        similarity_index = load_similarity_index(index_path, matrix, index_data)
+        if similarity_index is None:
+            print("Feature matrix changed since", index_path.name, "was built, rebuilding")
+    if similarity_index is None:
+        start = time.perf_counter()
+        similarity_index = build_similarity_index(matrix, index_data)
+        save_similarity_index(similarity_index, index_path)
+        print(f"Built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    if args.command == "bench":
+        benchmark(similarity_index, k=args.k)
+    elif args.command == "query":
+        track_ids = args.track_id
+        if not track_ids:
+            merged_index = pd.read_csv(data_folder / audio_matrix_index_filename)
+            track_ids = merged_index["track_id"].dropna().tolist()
+        start = time.perf_counter()
+        results = similar_songs(similarity_index, matrix, index_data, track_ids, args.k)
+        print(f"Answered {results['query_track_id'].nunique() if not results.empty else 0} queries in {(time.perf_counter() - start) * 1000:.1f} ms")
+        if args.out:
+            results.to_csv(args.out, index=False)
+            print("Saved results →", args.out)
+        else:
+            print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
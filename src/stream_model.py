@@ -0,0 +1,159 @@
+# src/stream_model.py
+# predicts total streams from audio features, duration and artist stats
+# ridge regression on log(streams), fitted once on spotify_kworb_kaggle1.csv and saved with its preprocessing
+# the model is only refit when the training data fingerprint changes
+# score() is vectorized so a whole candidate table is scored in one pass
+
+import os
+import time
+import hashlib
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from src.config import (data_folder,audio_feature_columns,spotify_kworb_kaggle1_filename,kaggle_audio_subfolder,stream_model_filename,stream_predictions_filename,ridge_alpha)
+
+model_feature_columns = audio_feature_columns + ["duration_ms", "artist_followers", "artist_popularity"]
+
+
+def pick_column(data, possible_names):
+    for name in possible_names:
+        if name in data.columns:
+            return name
+    return None
+
+
+def prepare_features(data):
+    features = pd.DataFrame(index=data.index)
+    for column_name in model_feature_columns:
+        source_column = column_name
+        if column_name == "duration_ms":
+            source_column = pick_column(data, ["duration_ms_spotify", "duration_ms", "duration_ms_kaggle"])
+        if source_column is not None and source_column in data.columns:
+            features[column_name] = pd.to_numeric(data[source_column], errors="coerce")
+        else:
+            features[column_name] = np.nan
+    # followers span several orders of magnitude
+    features["artist_followers"] = np.log1p(features["artist_followers"])
+    return features.to_numpy(dtype=np.float64)
+
+
+def training_fingerprint(data, streams_column):
+    columns = [c for c in model_feature_columns + ["duration_ms_spotify", streams_column] if c in data.columns]
+    hashed = pd.util.hash_pandas_object(data[columns], index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes() + ",".join(columns).encode("utf-8") + str(ridge_alpha).encode("utf-8")).hexdigest()
+
+
+def fit_model(data, streams_column, alpha=ridge_alpha):
+    streams = pd.to_numeric(data[streams_column], errors="coerce").to_numpy(dtype=np.float64)
+    features = prepare_features(data)
+    keep = ~np.isnan(streams) & (streams > 0)
+    features = features[keep]
+    target = np.log(streams[keep])
+
+    mean = np.nanmean(features, axis=0)
+    mean = np.where(np.isnan(mean), 0.0, mean)
+    std = np.nanstd(features, axis=0)
+    std = np.where(np.isnan(std) | (std == 0), 1.0, std)
+    standardized = np.nan_to_num((features - mean) / std)
+
+    intercept = target.mean()
+    gram = standardized.T @ standardized + alpha * np.eye(standardized.shape[1])
+    weights = np.linalg.solve(gram, standardized.T @ (target - intercept))
+
+    residuals = target - (standardized @ weights + intercept)
+    r_squared = 1 - (residuals ** 2).sum() / ((target - intercept) ** 2).sum()
+
+    return {
+        "weights": weights,
+        "intercept": intercept,
+        "mean": mean,
+        "std": std,
+        "columns": np.array(model_feature_columns),
+        "fingerprint": np.array(training_fingerprint(data, streams_column)),
+        "train_rows": np.array(len(target)),
+        "r_squared": np.array(r_squared),}
+
+
+def save_model(model, model_path):
+    np.savez(model_path, **model)
+
+
+def load_model(model_path):
+    saved = np.load(model_path)
+    model = {name: saved[name] for name in saved.files}
+    if list(model["columns"]) != model_feature_columns:
+        return None
+    return model
+
+
+def score(model, data):
+    # missing values become the training mean (0 after standardizing)
+    standardized = np.nan_to_num((prepare_features(data) - model["mean"]) / model["std"])
+    return np.exp(standardized @ model["weights"] + model["intercept"])
+
+
+def load_or_fit(training_data, streams_column, model_path):
+    fingerprint = training_fingerprint(training_data, streams_column)
+    model_path = Path(model_path)
+    if model_path.exists():
+        model = load_model(model_path)
+        if model is not None and str(model["fingerprint"]) == fingerprint:
+            print("Training data unchanged, reusing model →", model_path)
+            return model
+
+    start = time.perf_counter()
+    model = fit_model(training_data, streams_column)
+    print(f"Fit on {int(model['train_rows'])} songs in {(time.perf_counter() - start) * 1000:.1f} ms (R² on log streams: {float(model['r_squared']):.3f})")
+    save_model(model, model_path)
+    print("Saved model →", model_path)
+    return model
+
+
+def find_kaggle_csv():
+    kaggle_folder = data_folder / kaggle_audio_subfolder
+    if not kaggle_folder.exists():
+        return None
+    for file_name in sorted(os.listdir(kaggle_folder)):
+        if file_name.lower().endswith(".csv"):
+            return kaggle_folder / file_name
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit (if needed) the stream model and score candidate songs")
+    parser.add_argument("--train",type=str,default=str(data_folder / spotify_kworb_kaggle1_filename),help="Merged training CSV")
+    parser.add_argument("--candidates",type=str,default=None,help="CSV of songs to score (default: the Kaggle audio table)")
+    parser.add_argument("--model",type=str,default=str(data_folder / stream_model_filename),help="Saved model path (.npz)")
+    parser.add_argument("--out",type=str,default=str(data_folder / stream_predictions_filename),help="Output CSV for predictions")
+    args = parser.parse_args()
+
+    train_path = Path(args.train)
+    if not train_path.exists():
+        print("ERROR:", train_path, "not found")
+        return
+    training_data = pd.read_csv(train_path)
+    streams_column = pick_column(training_data, ["kworb_streams", "Streams"])
+    if streams_column is None:
+        print("ERROR: no streams column in", train_path.name)
+        return
+
+    model = load_or_fit(training_data, streams_column, args.model)
+
+    candidates_path = Path(args.candidates) if args.candidates else find_kaggle_csv()
+    if candidates_path is None or not candidates_path.exists():
+        print("ERROR: no candidate CSV to score")
+        return
+    candidates = pd.read_csv(candidates_path)
+
+    start = time.perf_counter()
+    candidates["predicted_streams"] = score(model, candidates)
+    print(f"Scored {len(candidates)} songs in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    id_columns = [c for c in ["track_id", "sp_track_id", "track_name", "name", "track_artist", "artist_names"] if c in candidates.columns]
+    candidates[id_columns + ["predicted_streams"]].sort_values("predicted_streams", ascending=False).to_csv(args.out, index=False)
+    print("Saved predictions →", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# src/track_index.py
+# local cross-catalog index of every Spotify track we have resolved so far
+# keyed by the Kworb (title, artist) we searched for, the normalized Spotify name/artist and the ISRC
+# the puller checks it before searching so known songs never hit the API again
+# saved to data/track_index.csv
+
+import os
+import re
+from pathlib import Path
+import pandas as pd
+
+# artist stats ride along so index hits need no artist call either
+artist_columns = ["artist_followers","artist_popularity","artist_genres"]
+index_columns = ["kworb_key","name_key","_jn_name","_jn_artist","sp_track_id","isrc","name","artist_names","album_name","release_date","explicit","duration_ms","popularity","primary_artist_id"] + artist_columns
+
+# words that mark an alternate version of a song
+version_words = ["live","remix","acoustic","instrumental","karaoke","sped up","slowed","cover","demo","edit","version","mix"]
+
+# version words whose inflected forms mark a version too
+inflected_suffix = {"remaster": r"\w*", "remix": r"\w*"}
+
+
+def normalize_text(value):
+    if pd.notna(value) and value is not None:
+        return " ".join(str(value).strip().lower().split())
+    else:
+        return ""
+
+
+def title_words(title):
+    # whole words only, so "Alive" does not count as "live"
+    return " ".join(re.findall(r"[a-z0-9]+", normalize_text(title)))
+
+
+def matched_version_words(title, words=version_words):
+    # "remaster"/"remix" also cover "Remastered"/"Remixed"; other words must match exactly
+    words_in_title = title_words(title)
+    return {word for word in words if re.search(rf"\b{re.escape(word)}{inflected_suffix.get(word, '')}\b", words_in_title)}
+
+
+def make_key(title, artist):
+    return normalize_text(title) + " - " + normalize_text(artist)
+
+
+def store_record(track_index, record):
+    track_index["by_kworb"][record["kworb_key"]] = record
+    if record.get("name_key"):
+        track_index["by_name"].setdefault(record["name_key"], record)
+    isrc = record.get("isrc")
+    if isinstance(isrc, str) and isrc:
+        track_index["by_isrc"].setdefault(isrc, record)
+
+
+def load_track_index(index_path):
+    track_index = {"by_kworb": {}, "by_name": {}, "by_isrc": {}}
+    index_path = Path(index_path)
+    if index_path.exists():
+        saved = pd.read_csv(index_path, dtype={"isrc": str, "sp_track_id": str})
+        for record in saved.to_dict("records"):
+            store_record(track_index, record)
+    return track_index
+
+
+def lookup_track(track_index, kworb_title, kworb_artist):
+    key = make_key(kworb_title, kworb_artist)
+    if key in track_index["by_kworb"]:
+        return track_index["by_kworb"][key]
+    # a different kworb spelling of a song we already resolved
+    return track_index["by_name"].get(key)
+
+
+def add_track(track_index, kworb_title, kworb_artist, fields):
+    record = {column: fields.get(column) for column in index_columns}
+    record["kworb_key"] = make_key(kworb_title, kworb_artist)
+    record["name_key"] = make_key(fields.get("name"), str(fields.get("artist_names") or "").split(",")[0])
+
+    # same recording already indexed under another track id (single vs album release)
+    isrc = record.get("isrc")
+    if isinstance(isrc, str) and isrc in track_index["by_isrc"]:
+        record = dict(track_index["by_isrc"][isrc])
+        record["kworb_key"] = make_key(kworb_title, kworb_artist)
+
+    store_record(track_index, record)
+    return record
+
+
+def save_track_index(track_index, index_path):
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    # other workers may have saved since we loaded, keep their songs too
+    on_disk = load_track_index(index_path)["by_kworb"]
+    on_disk.update(track_index["by_kworb"])
+    records = list(on_disk.values())
+    # write then rename so a worker never reads a half-written file
+    temp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+    pd.DataFrame(records, columns=index_columns).to_csv(temp_path, index=False)
+    os.replace(temp_path, index_path)
+
+
+def index_results(track_index, results):
+    # fold finished enrichment rows back into the index (covers saves that raced between workers)
+    for record in results.to_dict("records"):
+        if lookup_track(track_index, record.get("kworb_title"), record.get("kworb_artist")) is None:
+            add_track(track_index, record.get("kworb_title"), record.get("kworb_artist"), record)
+
+
+def score_candidate(track_data, kworb_title, kworb_artist):
+    wanted_title = normalize_text(kworb_title)
+    wanted_artist = normalize_text(kworb_artist)
+    candidate_title = normalize_text(track_data.get("name"))
+    candidate_artists = [normalize_text(a.get("name")) for a in track_data.get("artists", [])]
+
+    score = 0.0
+    if candidate_title == wanted_title:
+        score += 3
+    elif wanted_title and (wanted_title in candidate_title or candidate_title in wanted_title):
+        score += 1
+
+    if wanted_artist in candidate_artists:
+        score += 3
+    elif any(a and (a in wanted_artist or wanted_artist in a) for a in candidate_artists):
+        score += 1
+
+    score -= 2 * len(matched_version_words(candidate_title) - matched_version_words(wanted_title))
+
+    # popularity only breaks ties
+    score += (track_data.get("popularity") or 0) / 1000.0
+    return score
+
+
+def pick_best_candidate(candidates, kworb_title, kworb_artist):
+    if not candidates:
+        return None
+    return max(candidates, key=lambda track: score_candidate(track, kworb_title, kworb_artist))
@@ -0,0 +1,202 @@
+# src/work_queue.py
+# durable SQLite work queue for Spotify enrichment (data/enrichment_queue.sqlite)
+# workers lease batches of kworb rows, write results idempotently and expired leases go back to pending
+# several processes or hosts can share one queue file; results are assembled back in kworb order
+# the breaker table holds the Spotify circuit-breaker pause, so a 429/5xx storm pauses every worker
+
+import os
+import io
+import csv
+import json
+import time
+import sqlite3
+from pathlib import Path
+import pandas as pd
+
+schema = """
+CREATE TABLE IF NOT EXISTS songs (
+    song_key TEXT PRIMARY KEY,
+    row_order INTEGER,
+    artist TEXT,
+    title TEXT,
+    streams REAL,
+    daily_streams REAL,
+    status TEXT DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER DEFAULT 0,
+    error TEXT);
+CREATE INDEX IF NOT EXISTS idx_songs_status ON songs (status, row_order);
+CREATE TABLE IF NOT EXISTS results (
+    song_key TEXT PRIMARY KEY,
+    worker TEXT,
+    record TEXT);
+CREATE TABLE IF NOT EXISTS breaker (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    paused_until REAL);
+"""
+
+
+def normalize_text(value):
+    if pd.notna(value):
+        return str(value).strip().lower()
+    else:
+        return ""
+
+
+def song_key(title, artist):
+    return normalize_text(title) + " - " + normalize_text(artist)
+
+
+def connect(queue_path):
+    connection = sqlite3.connect(str(queue_path), timeout=60, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(schema)
+    return connection
+
+
+def enqueue_kworb_rows(queue_path, kworb_df):
+    # known songs keep their status, only their position and stream counts are refreshed
+    rows = [
+        (song_key(row["Title"], row["Artist"]), int(row["__order"]), str(row["Artist"]), str(row["Title"]),
+         none_if_missing(row.get("Streams")), none_if_missing(row.get("Daily [streams]")))
+        for row in kworb_df.to_dict("records")]
+    connection = connect(queue_path)
+    with connection:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany("""
+            INSERT INTO songs (song_key, row_order, artist, title, streams, daily_streams) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(song_key) DO UPDATE SET row_order=excluded.row_order, streams=excluded.streams, daily_streams=excluded.daily_streams""", rows)
+        # rows that fell off the chart are not assembled any more
+        keys = [row[0] for row in rows]
+        connection.execute("CREATE TEMP TABLE current_keys (song_key TEXT PRIMARY KEY)")
+        connection.executemany("INSERT OR IGNORE INTO current_keys VALUES (?)", [(key,) for key in keys])
+        connection.execute("UPDATE songs SET row_order = NULL WHERE song_key NOT IN (SELECT song_key FROM current_keys)")
+    connection.close()
+    return len(rows)
+
+
+dead_letter_columns = ["Artist", "Title", "Streams", "Daily [streams]", "error"]
+
+
+def append_dead_letter(dead_letter_path, kworb_row, error):
+    # written the moment a song fails, so a crash or Ctrl-C keeps every failure so far
+    # one O_APPEND write per row keeps lines from several workers whole; assemble_results rewrites the file at the end
+    line = io.StringIO()
+    csv.writer(line).writerow([kworb_row["Artist"], kworb_row["Title"], kworb_row.get("Streams"), kworb_row.get("Daily [streams]"), str(error)])
+    dead_letter_path = Path(dead_letter_path)
+    try:
+        header_fd = os.open(dead_letter_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND)
+        os.write(header_fd, (",".join(dead_letter_columns) + "\n").encode("utf-8"))
+        os.close(header_fd)
+    except FileExistsError:
+        pass
+    row_fd = os.open(dead_letter_path, os.O_WRONLY | os.O_APPEND)
+    os.write(row_fd, line.getvalue().encode("utf-8"))
+    os.close(row_fd)
+
+
+def none_if_missing(value):
+    if value is None or pd.isna(value):
+        return None
+    return float(value)
+
+
+def lease_batch(queue_path, worker_id, batch_size, lease_seconds):
+    now = time.time()
+    connection = connect(queue_path)
+    with connection:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("UPDATE songs SET status='pending', lease_owner=NULL WHERE status='leased' AND lease_expires < ?", (now,))
+        leased = connection.execute("""
+            SELECT song_key, row_order, artist, title, streams, daily_streams FROM songs
+            WHERE status='pending' AND row_order IS NOT NULL ORDER BY row_order LIMIT ?""", (batch_size,)).fetchall()
+        connection.executemany(
+            "UPDATE songs SET status='leased', lease_owner=?, lease_expires=?, attempts=attempts+1 WHERE song_key=?",
+            [(worker_id, now + lease_seconds, row[0]) for row in leased])
+    connection.close()
+    return [
+        {"song_key": row[0], "__order": row[1], "Artist": row[2], "Title": row[3], "Streams": row[4], "Daily [streams]": row[5]}
+        for row in leased]
+
+
+def complete_song(queue_path, worker_id, key, record):
+    # INSERT OR REPLACE keeps a re-run of the same song idempotent
+    connection = connect(queue_path)
+    with connection:
+        connection.execute("BEGIN IMMEDIATE")
+        if record is not None:
+            connection.execute("INSERT OR REPLACE INTO results (song_key, worker, record) VALUES (?, ?, ?)", (key, worker_id, json.dumps(record, default=str)))
+            connection.execute("UPDATE songs SET status='done', lease_owner=NULL, error=NULL WHERE song_key=?", (key,))
+        else:
+            connection.execute("UPDATE songs SET status='no_match', lease_owner=NULL, error=NULL WHERE song_key=?", (key,))
+    connection.close()
+
+
+def fail_song(queue_path, worker_id, key, error):
+    connection = connect(queue_path)
+    with connection:
+        connection.execute("UPDATE songs SET status='failed', lease_owner=NULL, error=? WHERE song_key=?", (str(error), key))
+    connection.close()
+
+
+def retry_failed(queue_path, include_no_match=False):
+    statuses = ("failed", "no_match") if include_no_match else ("failed",)
+    connection = connect(queue_path)
+    with connection:
+        count = connection.execute(
+            f"UPDATE songs SET status='pending', error=NULL WHERE status IN ({','.join('?' * len(statuses))})", statuses).rowcount
+    connection.close()
+    return count
+
+
+def breaker_paused_until(queue_path):
+    connection = connect(queue_path)
+    row = connection.execute("SELECT paused_until FROM breaker WHERE id = 0").fetchone()
+    connection.close()
+    return row[0] if row else 0.0
+
+
+def extend_breaker_pause(queue_path, paused_until):
+    connection = connect(queue_path)
+    with connection:
+        connection.execute("""
+            INSERT INTO breaker (id, paused_until) VALUES (0, ?)
+            ON CONFLICT(id) DO UPDATE SET paused_until = MAX(paused_until, excluded.paused_until)""", (paused_until,))
+    connection.close()
+
+
+def queue_counts(queue_path):
+    connection = connect(queue_path)
+    counts = dict(connection.execute("SELECT status, COUNT(*) FROM songs WHERE row_order IS NOT NULL GROUP BY status").fetchall())
+    connection.close()
+    return counts
+
+
+def assemble_results(queue_path, out_path, dead_letter_path):
+    connection = connect(queue_path)
+    done = connection.execute("""
+        SELECT results.record, songs.streams, songs.daily_streams FROM results JOIN songs USING (song_key)
+        WHERE songs.row_order IS NOT NULL ORDER BY songs.row_order""").fetchall()
+    failed = connection.execute("""
+        SELECT artist, title, streams, daily_streams, error FROM songs
+        WHERE status='failed' AND row_order IS NOT NULL ORDER BY row_order""").fetchall()
+    connection.close()
+
+    records = []
+    for record_json, streams, daily_streams in done:
+        record = json.loads(record_json)
+        # stream counts come from the latest kworb scrape, not from when the song was enriched
+        record["kworb_streams"] = streams
+        record["kworb_daily_streams"] = daily_streams
+        records.append(record)
+    pd.DataFrame(records).to_csv(out_path, index=False)
+    print("Assembled", len(records), "rows in Kworb order →", out_path)
+
+    dead_letter_path = Path(dead_letter_path)
+    if failed:
+        pd.DataFrame(failed, columns=dead_letter_columns).to_csv(dead_letter_path, index=False)
+        print("Failed songs:", len(failed), "→", dead_letter_path, "(rerun with --retry-failed)")
+    elif dead_letter_path.exists():
+        dead_letter_path.unlink()
+    return len(records)
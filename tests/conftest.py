@@ -0,0 +1,96 @@
+# tests/conftest.py
+# run from the repo root: python -m pytest -q
+# mock_spotify: a local threaded HTTP server standing in for the Spotify API
+
+import sys
+import json
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class MockSpotify:
+    # tests set respond(method, path, query) → (status, body dict or None, headers dict)
+    def __init__(self, server):
+        self.server = server
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+        self.requests = []
+        self.lock = threading.Lock()
+        self.respond = lambda method, path, query: (404, None, {})
+
+    def calls(self, path_prefix):
+        with self.lock:
+            return [(path, query) for _, path, query in self.requests if path.startswith(path_prefix)]
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        def handle_request(self, method):
+            parsed = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+            if method == "POST":
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with mock.lock:
+                mock.requests.append((method, parsed.path, query))
+            if parsed.path == "/api/token":
+                status, body, headers = 200, {"access_token": "test-token", "token_type": "Bearer", "expires_in": 3600}, {}
+            else:
+                status, body, headers = mock.respond(method, parsed.path, query)
+            payload = json.dumps(body).encode("utf-8") if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self.handle_request("GET")
+
+        def do_POST(self):
+            self.handle_request("POST")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def mock_spotify(monkeypatch):
+    from src import pull_spotify_kworb400, retry_policy
+    server = ThreadingHTTPServer(("127.0.0.1", 0), None)
+    mock = MockSpotify(server)
+    server.RequestHandlerClass = make_handler(mock)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(pull_spotify_kworb400, "token_url", mock.url + "/api/token")
+    monkeypatch.setattr(pull_spotify_kworb400, "search_url", mock.url + "/v1/search")
+    monkeypatch.setattr(pull_spotify_kworb400, "artists_url", mock.url + "/v1/artists")
+    monkeypatch.setattr(pull_spotify_kworb400, "client_id", "test-id")
+    monkeypatch.setattr(pull_spotify_kworb400, "client_secret", "test-secret")
+    monkeypatch.setattr(pull_spotify_kworb400, "sleep_between_calls", 0)
+    monkeypatch.setattr(retry_policy, "backoff_seconds", lambda attempt: 0.01)
+    # a fresh budget and breaker for every test
+    monkeypatch.setattr(pull_spotify_kworb400, "retry_policy", retry_policy.make_policy())
+    yield mock
+    server.shutdown()
+    server.server_close()
+
+
+def track_item(track_id, name, artist_name, artist_id, isrc=None, popularity=50):
+    return {
+        "id": track_id,
+        "name": name,
+        "artists": [{"id": artist_id, "name": artist_name}],
+        "album": {"name": f"{name} (Album)", "release_date": "2020-01-01"},
+        "external_ids": {"isrc": isrc} if isrc else {},
+        "explicit": False,
+        "duration_ms": 200000,
+        "popularity": popularity,}
@@ -0,0 +1,45 @@
+# tests/test_audio_features.py
+# batched /audio-features calls against the mock Spotify API
+
+import sys
+import pandas as pd
+from src import pull_spotify_audio_features, response_archive
+from src.config import audio_feature_columns
+from src.retry_policy import make_policy
+
+
+def test_batches_nulls_and_503_retry(tmp_path, monkeypatch, mock_spotify):
+    monkeypatch.setattr(response_archive, "archive_raw_responses", False)
+    monkeypatch.setattr(pull_spotify_audio_features, "audio_features_url", mock_spotify.url + "/v1/audio-features")
+    monkeypatch.setattr(pull_spotify_audio_features, "retry_policy", make_policy())
+    monkeypatch.setattr(pull_spotify_audio_features, "sleep_between_calls", 0)
+
+    track_ids = [f"track{i:03d}" for i in range(250)]
+    unknown_ids = {"track005", "track150", "track249"}
+    pd.DataFrame({"sp_track_id": track_ids + ["track001"]}).to_csv(tmp_path / "spotify.csv", index=False)
+    unavailable_once = {"track100"}
+
+    def respond(method, path, query):
+        ids = query["ids"].split(",")
+        if ids[0] in unavailable_once:
+            unavailable_once.discard(ids[0])
+            return 503, {"error": {"status": 503}}, {}
+        features = [None if track_id in unknown_ids else {"id": track_id, **{c: 0.5 for c in audio_feature_columns}} for track_id in ids]
+        return 200, {"audio_features": features}, {}
+
+    mock_spotify.respond = respond
+    monkeypatch.setattr(sys, "argv", ["pull_spotify_audio_features.py", "--spotify", str(tmp_path / "spotify.csv"), "--out", str(tmp_path / "features.csv")])
+    pull_spotify_audio_features.main()
+
+    batches = [query["ids"].split(",") for _, query in mock_spotify.calls("/v1/audio-features")]
+    # 100 + 100 + 50 ids, the second batch asked twice because of the 503
+    assert [len(batch) for batch in batches] == [100, 100, 100, 50]
+    assert batches[1] == batches[2]
+    features = pd.read_csv(tmp_path / "features.csv")
+    assert sorted(features["sp_track_id"]) == sorted(set(track_ids) - unknown_ids)
+    assert list(features.columns) == ["sp_track_id"] + audio_feature_columns
+
+    # a second run only asks for ids it does not have yet
+    pull_spotify_audio_features.main()
+    later_batches = [query["ids"].split(",") for _, query in mock_spotify.calls("/v1/audio-features")][len(batches):]
+    assert sorted(track_id for batch in later_batches for track_id in batch) == sorted(unknown_ids)
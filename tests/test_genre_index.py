@@ -0,0 +1,17 @@
+# tests/test_genre_index.py
+
+import pandas as pd
+from src.genre_index import build_genre_index, save_genre_index, load_genre_index
+
+
+def test_refreshed_csv_with_the_same_row_count_is_stale(tmp_path):
+    csv_path = tmp_path / "songs.csv"
+    data = pd.DataFrame({"name": ["a", "b", "c"], "artist_genres": ["pop, dance pop", "", "rock"]})
+    data.to_csv(csv_path, index=False)
+    incidence, vocabulary = build_genre_index(data)
+    save_genre_index(incidence, vocabulary, csv_path, data)
+
+    assert load_genre_index(csv_path, pd.read_csv(csv_path))[0] is not None
+
+    refreshed = pd.DataFrame({"name": ["a", "d", "c"], "artist_genres": ["pop, dance pop", "k-pop", "rock"]})
+    assert load_genre_index(csv_path, refreshed) == (None, None)
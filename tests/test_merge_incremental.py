@@ -0,0 +1,116 @@
+# tests/test_merge_incremental.py
+
+import pandas as pd
+import pytest
+from src.config import audio_feature_columns
+from src.merge_spotify_kaggle1 import merge_frames, merge_spotify_and_kaggle, merge_spotify_and_kaggle_incremental
+from src import merge_spotify_youtube as merge_spotify_youtube_module
+from src.merge_spotify_youtube import merge_spotify_youtube, merge_spotify_youtube_incremental
+
+
+def spotify_rows(track_ids):
+    songs = {
+        "a": ("Song A", "Artist A"),
+        "b": ("Song B", "Artist B"),
+        "c": ("Song C", "Artist C"),
+        "d": ("Song D", "Artist D"),
+        # another release of song b
+        "e": ("Song B", "Artist B"),}
+    return pd.DataFrame({
+        "sp_track_id": track_ids,
+        "name": [songs[t][0] for t in track_ids],
+        "artist_names": [songs[t][1] for t in track_ids],
+        "release_date": "2020-01-01",
+        "kworb_streams": [1000.0 * (i + 1) for i in range(len(track_ids))],
+        "kworb_daily_streams": [10.0 * (i + 1) for i in range(len(track_ids))],})
+
+
+def kaggle_table(with_track_e):
+    rows = [("a", "Song A", "Artist A"), ("kb", "Song B", "Artist B"), ("c", "Song C", "Artist C"), ("kd", "Song D", "Artist D")]
+    if with_track_e:
+        rows.append(("e", "Song B", "Artist B"))
+    kaggle_data = pd.DataFrame(rows, columns=["track_id", "track_name", "track_artist"])
+    for position, column_name in enumerate(audio_feature_columns):
+        kaggle_data[column_name] = [0.1 * (position + row) for row in range(len(kaggle_data))]
+    kaggle_data["lyrics"] = None
+    kaggle_data["track_popularity"] = 50
+    kaggle_data["track_album_release_date"] = "2020-01-01"
+    return kaggle_data
+
+
+def read_sorted(path):
+    data = pd.read_csv(path)
+    return data.sort_values("sp_track_id").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("with_track_e", [False, True])
+def test_incremental_kaggle_merge_matches_full_rebuild(tmp_path, with_track_e):
+    previous_spotify = tmp_path / "previous_spotify.csv"
+    spotify = tmp_path / "spotify.csv"
+    spotify_rows(["a", "b", "c"]).to_csv(previous_spotify, index=False)
+    spotify_rows(["a", "b", "c", "d", "e"]).to_csv(spotify, index=False)
+
+    incremental_out = tmp_path / "incremental" / "merged.csv"
+    full_out = tmp_path / "full" / "merged.csv"
+    incremental_out.parent.mkdir()
+    full_out.parent.mkdir()
+
+    merge_spotify_and_kaggle(previous_spotify, kaggle_table(with_track_e), incremental_out)
+    merge_spotify_and_kaggle_incremental(spotify, kaggle_table(with_track_e), incremental_out)
+    merge_spotify_and_kaggle(spotify, kaggle_table(with_track_e), full_out)
+
+    incremental = read_sorted(incremental_out)
+    full = read_sorted(full_out)
+    assert not incremental["merge_key"].duplicated().any()
+    pd.testing.assert_frame_equal(incremental[full.columns], full, check_dtype=False)
+
+
+def test_incremental_youtube_merge_only_matches_new_songs(tmp_path, monkeypatch):
+    youtube_data = pd.DataFrame({
+        "Video": ["Artist A - Song A (Official Video)", "Artist D - Song D", "Something Else"],
+        "Total Views": ["3,000", "2,000", "1,000"],})
+    previous_spotify = tmp_path / "previous_spotify.csv"
+    spotify = tmp_path / "spotify.csv"
+    spotify_rows(["a", "b", "c"]).to_csv(previous_spotify, index=False)
+    spotify_rows(["a", "b", "c", "d"]).to_csv(spotify, index=False)
+    incremental_out = tmp_path / "incremental" / "final.csv"
+    full_out = tmp_path / "full" / "final.csv"
+    incremental_out.parent.mkdir()
+    full_out.parent.mkdir()
+
+    merge_spotify_youtube(previous_spotify, youtube_data.copy(), incremental_out)
+    matched_ids = []
+    original_match = merge_spotify_youtube_module.match_youtube_rows
+
+    def recording_match(spotify_data, youtube_table):
+        matched_ids.extend(spotify_data["sp_track_id"])
+        return original_match(spotify_data, youtube_table)
+
+    monkeypatch.setattr(merge_spotify_youtube_module, "match_youtube_rows", recording_match)
+    merge_spotify_youtube_incremental(spotify, youtube_data.copy(), incremental_out)
+    monkeypatch.undo()
+    merge_spotify_youtube(spotify, youtube_data.copy(), full_out)
+
+    # unmatched b and c were tried on the first run and are not scanned again
+    assert matched_ids == ["d"]
+    incremental = read_sorted(incremental_out)
+    full = read_sorted(full_out)
+    pd.testing.assert_frame_equal(incremental[full.columns], full, check_dtype=False)
+
+
+def test_id_first_join_counts_each_path(capsys):
+    spotify_data = pd.DataFrame({
+        "sp_track_id": ["a", "a", "x", "z"],
+        # x is not in kaggle under its id, but its name key is; z is nowhere
+        "name": ["Song A", "Song A", "Song B", "Song Z"],
+        "artist_names": ["Artist A", "Artist A", "Artist B", "Artist Z"],})
+
+    merged = merge_frames(spotify_data, kaggle_table(False))
+
+    assert merged.set_index("sp_track_id")["match_method"].to_dict() == {"a": "track_id", "x": "name"}
+    assert merged.set_index("sp_track_id").loc["x", "track_id"] == "kb"
+    output = capsys.readouterr().out
+    assert "Matched by track id: 1\n" in output
+    assert "Matched by name: 1\n" in output
+    assert "Repeats of a matched song: 1\n" in output
+    assert "Unmatched: 1\n" in output
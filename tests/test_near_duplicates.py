@@ -0,0 +1,42 @@
+# tests/test_near_duplicates.py
+
+import pandas as pd
+from src.near_duplicates import keep_canonical_versions, canonical_rank, find_version_clusters
+
+
+def test_live_inside_a_word_is_not_a_version():
+    videos = pd.DataFrame({
+        "name": ["Alive (Live)", "Alive", "Alive"],
+        "artist_names": ["Sia", "Sia", "Pearl Jam"],
+        "lyrics": [None, None, None],
+        "Total Views": ["9,000,000", "1,000,000", "5,000"],
+        "release_date": ["2016-01-01", "2015-09-25", "1991-08-27"],})
+
+    kept = keep_canonical_versions(videos, "name", "artist_names", "lyrics", ["Total Views"], "release_date")
+
+    assert sorted(zip(kept["name"], kept["artist_names"])) == [("Alive", "Pearl Jam"), ("Alive", "Sia")]
+
+
+def test_version_words_still_rank_below_the_original():
+    songs = pd.DataFrame({
+        "track_name": ["Alive - Remix", "Alive - Acoustic Version", "Alive"],
+        "track_artist": ["Sia", "Sia", "Sia"],})
+    clusters = find_version_clusters(songs, "track_name", "track_artist")
+
+    ranks = canonical_rank(songs, clusters, "track_name")
+
+    assert len(set(clusters)) == 1
+    assert list(ranks) == [1, 2, 0]
+
+
+def test_remastered_ranks_below_the_original():
+    songs = pd.DataFrame({
+        "track_name": ["Bohemian Rhapsody - Remastered 2011", "Bohemian Rhapsody", "Bohemian Rhapsody - Remixed"],
+        "track_artist": ["Queen", "Queen", "Queen"],
+        "track_popularity": [90, 60, 70],})
+    clusters = find_version_clusters(songs, "track_name", "track_artist")
+
+    ranks = canonical_rank(songs, clusters, "track_name", ["track_popularity"])
+
+    assert len(set(clusters)) == 1
+    assert ranks[1] == 0
@@ -0,0 +1,97 @@
+# tests/test_offline_rebuild.py
+# the --from-archive rebuild must write the same CSV as the online run it replays
+
+import sys
+import shutil
+import pandas as pd
+import pytest
+from src import pull_spotify_kworb400, response_archive
+from src.track_index import load_track_index, add_track, save_track_index
+from conftest import track_item
+
+
+def chart():
+    return pd.DataFrame({
+        "Artist": ["Sia", "Sia", "Pearl Jam", "Sia", "Daft Punk", "Nobody"],
+        "Title": ["Chandelier", "Alive", "Alive", "Alive (Single)", "One More Time", "Unknown Song"],
+        "Streams": [3_000_000_000, 900_000_000, 400_000_000, 300_000_000, 200_000_000, 100],
+        "Daily [streams]": [900_000, 500_000, 100_000, 40_000, 30_000, 1],})
+
+
+def search_results(query):
+    results = {
+        # live version first, scoring has to prefer the studio one
+        "Alive Sia": [track_item("sia-alive-live", "Alive (Live)", "Sia", "sia", "ISRC-SIA-ALIVE-LIVE", 90),
+                      track_item("sia-alive", "Alive", "Sia", "sia", "ISRC-SIA-ALIVE", 70)],
+        "Alive Pearl Jam": [track_item("pj-alive", "Alive", "Pearl Jam", "pearljam", "ISRC-PJ-ALIVE", 60)],
+        # same recording as sia-alive under another track id: resolved through the ISRC
+        "Alive (Single) Sia": [track_item("sia-alive-single", "Alive", "Sia", "sia", "ISRC-SIA-ALIVE", 40)],
+        "One More Time Daft Punk": [track_item("dp-omt", "One More Time", "Daft Punk", "daftpunk", "ISRC-DP-OMT", 80)],}
+    return results.get(query, [])
+
+
+def respond(method, path, query):
+    if path == "/v1/search":
+        return 200, {"tracks": {"items": search_results(query["q"])}}, {}
+    if path.startswith("/v1/artists/"):
+        artist_id = path.rsplit("/", 1)[-1]
+        return 200, {"id": artist_id, "followers": {"total": len(artist_id) * 1000}, "popularity": 70, "genres": [f"{artist_id} music", "pop"]}, {}
+    return 404, None, {}
+
+
+def run_puller(monkeypatch, tmp_path, index_path, out_path, *extra_args):
+    monkeypatch.setattr(sys, "argv", [
+        "pull_spotify_kworb400.py",
+        "--kworb", str(tmp_path / "kworb.csv"),
+        "--out", str(out_path),
+        "--index", str(index_path),
+        "--queue", str(tmp_path / "queue.sqlite"),
+        "--dead-letter", str(tmp_path / "dead_letter.csv"),
+        *extra_args])
+    pull_spotify_kworb400.main()
+
+
+@pytest.mark.parametrize("offline_index", ["index after the run", "index before the run"])
+def test_offline_rebuild_matches_online_run(tmp_path, monkeypatch, mock_spotify, offline_index):
+    monkeypatch.setattr(response_archive, "default_archive_dir", tmp_path / "raw_archive")
+    chart().to_csv(tmp_path / "kworb.csv", index=False)
+    mock_spotify.respond = respond
+
+    # Chandelier is already in the track index, so the online run never searches it
+    index_path = tmp_path / "track_index.csv"
+    track_index = load_track_index(index_path)
+    add_track(track_index, "Chandelier", "Sia", {
+        **pull_spotify_kworb400.track_fields(track_item("sia-chandelier", "Chandelier", "Sia", "sia", "ISRC-SIA-CH", 85)),
+        "artist_followers": 5000, "artist_popularity": 88, "artist_genres": "australian pop, pop"})
+    save_track_index(track_index, index_path)
+    shutil.copy(index_path, tmp_path / "track_index_before.csv")
+
+    run_puller(monkeypatch, tmp_path, index_path, tmp_path / "online.csv")
+    assert ("/v1/search", {"q": "Chandelier Sia", "type": "track", "limit": "5"}) not in mock_spotify.calls("/v1/search")
+
+    online_calls = len(mock_spotify.requests)
+    offline_index_path = index_path if offline_index == "index after the run" else tmp_path / "track_index_before.csv"
+    run_puller(monkeypatch, tmp_path, offline_index_path, tmp_path / "offline.csv", "--from-archive")
+    assert len(mock_spotify.requests) == online_calls
+
+    online = pd.read_csv(tmp_path / "online.csv")
+    offline = pd.read_csv(tmp_path / "offline.csv")
+    assert online["sp_track_id"].tolist() == ["sia-chandelier", "sia-alive", "pj-alive", "sia-alive", "dp-omt"]
+    pd.testing.assert_frame_equal(offline, online)
+    assert (tmp_path / "online.csv").read_bytes() == (tmp_path / "offline.csv").read_bytes()
+
+
+def test_offline_merge_skips_a_missing_kaggle_cache(tmp_path, monkeypatch, capsys):
+    from src import main, merge_spotify_kaggle1, merge_spotify_youtube
+    def no_download(*args):
+        raise AssertionError("offline run tried to download from Kaggle")
+    monkeypatch.setattr(main, "data_folder", tmp_path)
+    monkeypatch.setattr(merge_spotify_kaggle1, "get_kaggle_data", no_download)
+    monkeypatch.setattr(merge_spotify_youtube, "get_kaggle_youtube_data", no_download)
+
+    main.run_merge(offline=True)
+    main.run_merge_youtube(offline=True)
+
+    output = capsys.readouterr().out
+    assert output.count("- skipping the merge") == 2
+    assert not (tmp_path / "spotify_kworb_kaggle1.csv").exists()
@@ -0,0 +1,16 @@
+# tests/test_report_html.py
+# the browser charts must bucket like the PNG versions they replace
+
+import pandas as pd
+from src.report_html import tempo_buckets
+
+
+def test_tempo_buckets_keep_empty_ranges():
+    data = pd.DataFrame({"tempo": [92.0, 95.0, 95.1, 112.5, 120.0, None]})
+
+    chart = tempo_buckets(data)
+
+    # pd.cut over 90..120 in 5-BPM steps, include_lowest
+    expected = pd.cut(data["tempo"].dropna(), bins=range(90, 125, 5), include_lowest=True).value_counts().sort_index()
+    assert chart["labels"] == ["90-95", "95-100", "100-105", "105-110", "110-115", "115-120"]
+    assert chart["values"] == expected.tolist() == [2, 1, 0, 0, 1, 1]
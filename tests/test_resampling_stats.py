@@ -0,0 +1,58 @@
+# tests/test_resampling_stats.py
+
+import numpy as np
+import pandas as pd
+from src import analysis_spotify
+from src.resampling_stats import group_mean_statistics, correlation_statistics
+
+
+def test_bootstrap_ci_matches_the_normal_approximation():
+    values = np.random.default_rng(1).normal(100.0, 20.0, 400)
+    statistics = group_mean_statistics(values, ["all"] * 400, n_resamples=20000)
+
+    # 95% CI of a mean: mean ± 1.96 * sd / sqrt(n)
+    half_width = 1.96 * values.std() / np.sqrt(len(values))
+    row = statistics.iloc[0]
+    assert abs(row["mean"] - values.mean()) < 1e-9
+    assert abs(row["ci_low"] - (values.mean() - half_width)) < 0.1 * half_width
+    assert abs(row["ci_high"] - (values.mean() + half_width)) < 0.1 * half_width
+
+
+def test_permutation_p_value_matches_exact_enumeration():
+    # 6 equally likely ways to split 1..4 into two pairs, 2 of them as extreme as {1, 2} vs {3, 4}
+    statistics = group_mean_statistics([1.0, 2.0, 3.0, 4.0], ["a", "a", "b", "b"], n_resamples=20000).set_index("group")
+
+    assert statistics.loc["a", "difference_vs_rest"] == -2.0
+    assert abs(statistics.loc["a", "p_value"] - 1 / 3) < 0.015
+    assert abs(statistics.loc["b", "p_value"] - 1 / 3) < 0.015
+
+
+def test_correlation_ci_and_p_value():
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=500)
+    data = pd.DataFrame({"x": x, "y": 0.5 * x + rng.normal(scale=np.sqrt(0.75), size=500), "noise": rng.normal(size=500)})
+    statistics = correlation_statistics(data, ["y", "noise"], "x", n_resamples=5000).set_index("feature")
+
+    observed = np.corrcoef(data["x"], data["y"])[0, 1]
+    # Fisher z interval for the same sample
+    z, se = np.arctanh(observed), 1 / np.sqrt(len(data) - 3)
+    assert abs(statistics.loc["y", "correlation"] - observed) < 1e-9
+    assert abs(statistics.loc["y", "ci_low"] - np.tanh(z - 1.96 * se)) < 0.02
+    assert abs(statistics.loc["y", "ci_high"] - np.tanh(z + 1.96 * se)) < 0.02
+    assert statistics.loc["y", "p_value"] == 1 / 5001
+    assert statistics.loc["noise", "p_value"] > 0.05
+
+
+def test_deleted_stats_table_is_rewritten(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis_spotify, "plot_cache", {"force": False, "hits": 0, "misses": 0, "manifests": {}})
+    rng = np.random.default_rng(3)
+    data = pd.DataFrame({"duration_ms": rng.uniform(120000, 300000, 200), "kworb_streams": rng.lognormal(20, 1, 200)})
+    stats_path = tmp_path / "stats_duration_streams.csv"
+
+    analysis_spotify.duration_vs_streams(data, tmp_path)
+    assert stats_path.exists()
+    stats_path.unlink()
+    analysis_spotify.duration_vs_streams(data, tmp_path)
+
+    assert stats_path.exists()
+    assert analysis_spotify.plot_cache["hits"] == 0
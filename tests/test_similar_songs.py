@@ -0,0 +1,27 @@
+# tests/test_similar_songs.py
+
+import numpy as np
+import pandas as pd
+from src.config import feature_matrix_columns
+from src.similar_songs import build_similarity_index, save_similarity_index, load_similarity_index, similar_songs
+
+
+def feature_table(track_ids, seed):
+    matrix = np.random.default_rng(seed).random((len(track_ids), len(feature_matrix_columns)), dtype=np.float32)
+    index_data = pd.DataFrame({"track_id": track_ids, "track_name": track_ids, "track_artist": "someone"})
+    return matrix, index_data
+
+
+def test_saved_index_is_dropped_when_the_matrix_changes(tmp_path):
+    index_path = tmp_path / "similarity_index.npz"
+    matrix, index_data = feature_table([f"t{i}" for i in range(50)], seed=1)
+    save_similarity_index(build_similarity_index(matrix, index_data), index_path)
+
+    reloaded = load_similarity_index(index_path, matrix, index_data)
+    assert reloaded is not None
+    assert not similar_songs(reloaded, matrix, index_data, ["t0"], k=3).empty
+
+    # same songs, rebuilt in another order: saved rows would point at the wrong songs
+    order = np.random.default_rng(2).permutation(50)
+    rebuilt_matrix, rebuilt_index = matrix[order], index_data.iloc[order].reset_index(drop=True)
+    assert load_similarity_index(index_path, rebuilt_matrix, rebuilt_index) is None
@@ -0,0 +1,134 @@
+# tests/test_work_queue.py
+# several local workers against the mock Spotify API, sharing one queue file
+
+import sys
+import time
+import sqlite3
+import multiprocessing
+import pandas as pd
+from src import pull_spotify_kworb400, response_archive
+from src.retry_policy import make_policy, share_pause, record_failure, wait_for_breaker
+from src.work_queue import breaker_paused_until, extend_breaker_pause
+from conftest import track_item
+
+
+def kworb_chart(song_count):
+    return pd.DataFrame({
+        "Artist": [f"Artist {i % 7}" for i in range(song_count)],
+        "Title": [f"Song {i}" for i in range(song_count)],
+        "Streams": [float(10_000_000 - i * 1000) for i in range(song_count)],
+        "Daily [streams]": [float(50_000 - i) for i in range(song_count)],})
+
+
+def chart_responder(failing_titles):
+    def respond(method, path, query):
+        if path == "/v1/search":
+            title, artist = query["q"].rsplit(" Artist ", 1)
+            if title in failing_titles:
+                return 404, {"error": {"status": 404}}, {}
+            number = title.split()[-1]
+            item = track_item(f"track{number}", title, f"Artist {artist}", f"artist{artist}")
+            return 200, {"tracks": {"items": [item]}}, {}
+        if path.startswith("/v1/artists/"):
+            artist_id = path.rsplit("/", 1)[-1]
+            return 200, {"id": artist_id, "followers": {"total": 1000}, "popularity": 60, "genres": ["pop"]}, {}
+        return 404, None, {}
+    return respond
+
+
+def run_puller(monkeypatch, tmp_path, *extra_args):
+    monkeypatch.setattr(sys, "argv", [
+        "pull_spotify_kworb400.py",
+        "--kworb", str(tmp_path / "kworb.csv"),
+        "--out", str(tmp_path / "spotify.csv"),
+        "--index", str(tmp_path / "track_index.csv"),
+        "--queue", str(tmp_path / "queue.sqlite"),
+        "--dead-letter", str(tmp_path / "dead_letter.csv"),
+        *extra_args])
+    pull_spotify_kworb400.main()
+
+
+def test_local_workers_share_the_queue(tmp_path, monkeypatch, mock_spotify):
+    monkeypatch.setattr(response_archive, "archive_raw_responses", False)
+    chart = kworb_chart(40)
+    chart.to_csv(tmp_path / "kworb.csv", index=False)
+    failing_titles = {"Song 7", "Song 23"}
+    mock_spotify.respond = chart_responder(failing_titles)
+
+    run_puller(monkeypatch, tmp_path, "--workers", "3", "--batch-size", "4")
+
+    connection = sqlite3.connect(str(tmp_path / "queue.sqlite"))
+    statuses = connection.execute("SELECT title, status FROM songs").fetchall()
+    result_count = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    connection.close()
+
+    # every song finished exactly once: done or failed, one search each
+    assert len(statuses) == 40
+    assert {title for title, status in statuses if status == "failed"} == failing_titles
+    assert sum(status == "done" for _, status in statuses) == 38
+    assert result_count == 38
+    searched = pd.Series([query["q"] for _, query in mock_spotify.calls("/v1/search")])
+    assert len(searched) == 40 and searched.is_unique
+
+    output = pd.read_csv(tmp_path / "spotify.csv")
+    expected = chart[~chart["Title"].isin(failing_titles)]
+    assert output["kworb_title"].tolist() == expected["Title"].tolist()
+    assert output["kworb_streams"].tolist() == expected["Streams"].tolist()
+
+    dead_letter = pd.read_csv(tmp_path / "dead_letter.csv")
+    assert sorted(dead_letter["Title"]) == sorted(failing_titles)
+
+
+def trip_breaker(queue_path):
+    policy = make_policy()
+    share_pause(policy, lambda: breaker_paused_until(queue_path), lambda paused_until: extend_breaker_pause(queue_path, paused_until))
+    record_failure(policy, retry_after=1.0)
+
+
+def test_a_429_in_one_worker_pauses_the_others(tmp_path):
+    queue_path = tmp_path / "queue.sqlite"
+    worker = multiprocessing.Process(target=trip_breaker, args=(queue_path,))
+    worker.start()
+    worker.join()
+
+    policy = make_policy()
+    share_pause(policy, lambda: breaker_paused_until(queue_path), lambda paused_until: extend_breaker_pause(queue_path, paused_until))
+    start = time.monotonic()
+    wait_for_breaker(policy)
+    assert time.monotonic() - start > 0.5
+
+
+def test_retry_failed_can_include_no_match(tmp_path, monkeypatch, mock_spotify):
+    monkeypatch.setattr(response_archive, "archive_raw_responses", False)
+    kworb_chart(6).to_csv(tmp_path / "kworb.csv", index=False)
+    mock_spotify.respond = lambda method, path, query: (200, {"tracks": {"items": []}}, {}) if path == "/v1/search" else (404, None, {})
+    run_puller(monkeypatch, tmp_path)
+
+    mock_spotify.respond = chart_responder(set())
+    run_puller(monkeypatch, tmp_path, "--retry-failed")
+    assert len(mock_spotify.calls("/v1/search")) == 6
+    run_puller(monkeypatch, tmp_path, "--retry-failed", "--include-no-match")
+
+    assert len(mock_spotify.calls("/v1/search")) == 12
+    assert pd.read_csv(tmp_path / "spotify.csv")["kworb_title"].tolist() == kworb_chart(6)["Title"].tolist()
+
+
+def test_failures_reach_the_dead_letter_before_the_run_ends(tmp_path, monkeypatch, mock_spotify):
+    monkeypatch.setattr(response_archive, "archive_raw_responses", False)
+    kworb_chart(12).to_csv(tmp_path / "kworb.csv", index=False)
+    mock_spotify.respond = chart_responder({"Song 2", "Song 5"})
+
+    # a run that dies right after Song 6, before anything is assembled
+    def interrupt_after_song_6(queue_path, worker_id, key, record):
+        if key.startswith("song 6 "):
+            raise KeyboardInterrupt
+    monkeypatch.setattr(pull_spotify_kworb400, "complete_song", interrupt_after_song_6)
+    try:
+        run_puller(monkeypatch, tmp_path)
+    except KeyboardInterrupt:
+        pass
+
+    dead_letter = pd.read_csv(tmp_path / "dead_letter.csv")
+    assert dead_letter["Title"].tolist() == ["Song 2", "Song 5"]
+    assert list(dead_letter.columns) == ["Artist", "Title", "Streams", "Daily [streams]", "error"]
+    assert dead_letter["error"].str.contains("404").all()